@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+
+# Credence oracle for Fuzzy String Zendo: the probabilities that words are accepted,
+# for someone who knows exactly how fuzzy_rules.random_rule generates rules, and the
+# classifications of the words the player has seen, but not the rule itself. Its log
+# score is about the best achievable with the player's information.
+#
+# We sample many candidate rules from the same distribution as random_rule, weight each
+# by how well it agrees with the known classifications, and average their
+# classifications of the words. Candidates are trained in parallel, from one feature
+# matrix of a pool of dictionary words, and each classifies all words with one call.
+# Worker processes are forked where possible: started any other way, they would have to
+# import sklearn again, which alone takes longer than the oracle is meant to.
+
+import multiprocessing
+from os import path
+from random import Random
+import random
+import math
+import sys
+import time
+
+import numpy as np
+import sklearn
+from sklearn.svm import SVC
+
+import fuzzy_rules as r
+sys.path.append(path.join(path.dirname(path.realpath(__file__)), "..", "shared"))
+import sampling
+
+
+# Configuration
+########################################################################
+
+NUM_CANDIDATES = 200 # number of candidate rules to sample
+CANDIDATES_PER_JOB = 25 # number of candidates each worker process generates at a time
+
+MIN_CANDIDATES = 20
+    # Fewer candidates than this (after weighting, see posterior) are too few for the
+    # credences to mean much.
+
+WORD_POOL_SIZE = 2000
+    # Candidates' training points are drawn from this many random dictionary words,
+    # whose features are computed once.
+
+TIME_LIMIT = 1
+    # Seconds to spend sampling candidates in the game, after which the ones found so
+    # far are used. At high difficulties most random rules are unreasonable, so each
+    # candidate takes dozens of classifiers to find, and fewer are found in time.
+
+LABEL_NOISE = .02
+    # A candidate's weight is multiplied by this for each known word it misclassifies
+    # (and by 1 - this for each it gets right), so that when no candidate agrees with
+    # everything the player has seen, the ones that nearly do still count.
+
+
+# Candidate rules
+########################################################################
+
+_context = multiprocessing.get_context("fork"
+        if "fork" in multiprocessing.get_all_start_methods() else None)
+
+pool_matrix = None # features (all of FEATURES) of the word pool, in worker processes
+words_matrix = None # features of the words to classify, in worker processes
+
+def _init_worker(word_pool_matrix, classified_words_matrix):
+    global pool_matrix, words_matrix
+    pool_matrix = word_pool_matrix
+    words_matrix = classified_words_matrix
+
+def _candidates(job):
+    """Generates up to `num_candidates` random reasonable rules at the given difficulty,
+    given the seed of their own random stream, stopping early at time `deadline` (if
+    not None). Returns an array of their decision function values, one row per rule
+    and one column per word to classify."""
+    difficulty, seed, num_candidates, deadline = job
+    rng = Random(seed)
+    points_per_class = r.TRAINING_POINTS_PER_CLASS(difficulty)
+    outputs = [1] * points_per_class + [0] * points_per_class
+    decisions = []
+    with sklearn.config_context(assume_finite=True):
+            # words are nonempty, so features are finite; checking that takes a third of the time
+        for i in range(r.NUM_RANDOM_RULE_TRIES):
+            if len(decisions) == num_candidates or (deadline is not None and time.time() > deadline):
+                break
+            training_rows = rng.sample(range(len(pool_matrix)), 2 * points_per_class)
+            features = sampling.sample_without_replacement(range(len(r.FEATURES)),
+                    r.FEATURE_PROBABILITIES, r.NUMBER_OF_FEATURES(difficulty), rng)
+            training_matrix = pool_matrix[np.ix_(training_rows, features)]
+            gamma = r.kernel_gamma(training_matrix)
+            kernel = r.poly_kernel(np.vstack((training_matrix, words_matrix[:, features])),
+                    training_matrix, gamma)
+            classifier = SVC(kernel='precomputed').fit(kernel[:len(training_rows)], outputs)
+            decision = classifier.decision_function(kernel) # on training points and words at once
+            if not r.reasonable_fit((decision[:points_per_class] >= 0).mean(),
+                    (decision[points_per_class:len(training_rows)] < 0).mean(), difficulty):
+                continue # random_rule would have rejected this rule too
+            decisions.append(decision[len(training_rows):])
+    return np.array(decisions).reshape(-1, len(words_matrix))
+
+def sample_decisions(words, difficulty, num_candidates=NUM_CANDIDATES, time_limit=None,
+        processes=None, rng=random):
+    """Returns the decision function values of up to `num_candidates` random rules at
+    this difficulty on each of `words`. A rule accepts a word where its value is
+    nonnegative (with the training points to accept given first, as in Rule, ties go
+    to accepting, as they do in SVC.predict)."""
+    deadline = time.time() + time_limit if time_limit is not None else None
+    pool_words = r.ALL_WORDS.sample(WORD_POOL_SIZE, rng)
+    jobs = []
+    while num_candidates > 0:
+        jobs.append((difficulty, rng.getrandbits(64), min(num_candidates, CANDIDATES_PER_JOB),
+            deadline))
+        num_candidates -= CANDIDATES_PER_JOB
+    init_args = (r.feature_matrix(r.FEATURES, pool_words), r.feature_matrix(r.FEATURES, words))
+    with _context.Pool(processes, _init_worker, init_args) as pool:
+        return np.concatenate(pool.map(_candidates, jobs))
+
+
+# Posterior credences
+########################################################################
+
+def posterior(accepted, known_accepted):
+    """Returns the posterior probability that the rule accepts each of some words, and
+    the effective number of candidates that went into it, given boolean array
+    `accepted` of whether each candidate (one per row) accepts each word (one per
+    column), the first of which are those whose classifications `known_accepted` are
+    known; the rest are the words to return credences for."""
+    num_known = len(known_accepted)
+    if len(accepted) == 0: # no reasonable candidates found
+        return np.full(accepted.shape[1] - num_known, .5), 0.
+    misclassified = (accepted[:, :num_known] != known_accepted).sum(axis=1)
+    log_weights = misclassified * math.log(LABEL_NOISE / (1 - LABEL_NOISE))
+    weights = np.exp(log_weights - log_weights.max())
+    effective_candidates = weights.sum() ** 2 / (weights ** 2).sum()
+    acceptance = weights @ accepted[:, num_known:] / weights.sum()
+    return (acceptance * effective_candidates + .5) / (effective_candidates + 1), effective_candidates
+        # Krichevsky-Trofimov estimate, so no credence is 0 or 1 from sampling alone
+
+def credences(known_words, words, difficulty, num_candidates=NUM_CANDIDATES, time_limit=None,
+        processes=None, rng=random):
+    """Returns the posterior probability that the rule accepts each of `words`, given
+    dict `known_words` mapping words to whether they are accepted, and the effective
+    number of candidates it's estimated from (see posterior).
+    Without a `time_limit` (in seconds), the result is the same for a given `rng` state."""
+    known = list(known_words)
+    accepted = sample_decisions(known + list(words), difficulty, num_candidates, time_limit,
+            processes, rng) >= 0
+    return posterior(accepted, np.array([known_words[word] for word in known], dtype=bool))
+
+
+if __name__ == "__main__":
+    raise Exception("Not intended to be called standalone.")
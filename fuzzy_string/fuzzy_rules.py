@@ -1,9 +1,20 @@
 #!/usr/bin/env python3
 
+from collections import OrderedDict
 from string import ascii_lowercase
-from random import choice, shuffle, random
+import random
+import os
 from os import path
-from sklearn.svm import SVC
+import sys
+import numpy as np
+
+sys.path.append(path.join(path.dirname(path.realpath(__file__)), "..", "shared"))
+import wordsource
+import sampling
+import profiling
+
+with profiling.phase("import sklearn"):
+    from sklearn.svm import SVC
 
 
 # Configuration
@@ -20,19 +31,28 @@ SENSITIVITY_SPECIFICITY_MINIMUM = lambda d: 1 - (2 / TRAINING_POINTS_PER_CLASS(d
 
 NUM_RANDOM_RULE_TRIES = 1000
 
+POLY_DEGREE = 3 # degree of the classifier's polynomial kernel
+
+FEATURE_CACHE_SIZE = 10 ** 5
+    # Number of feature values of dictionary words to cache (least recently used are
+    # dropped first); about 20 MB.
+
 TEST = True # Whether to run various checks and assertions
 
+# Every function here that needs randomness takes an `rng` argument, which should be a
+# random.Random instance. It defaults to the random module itself, i.e. the global stream.
+
 
 # Constants and globals
 ########################################################################
 
 # Requires file 'words.txt', each of whose lines should be exactly one word consisting of only lowercase letters.
 # (Creatable by taking a standard dictionary and doing: :%v/^[a-z]*/d )
-WORDS_PATH = path.join(path.dirname(path.realpath(__file__)), "..", "words.txt")
-ALL_WORDS = open(WORDS_PATH, "r").read().splitlines()
-
-VOWELS = set("aeiou" + choice(["", "y"])) # some rules will consider y to be a vowel!
-CONSONANTS = set(ascii_lowercase) - VOWELS
+# Another dictionary can be used by setting the environment variable ZENDO_WORDS to its path;
+# big ones are streamed from disk rather than loaded (see shared/wordsource.py).
+WORDS_PATH = os.environ.get("ZENDO_WORDS",
+        path.join(path.dirname(path.realpath(__file__)), "..", "words.txt"))
+ALL_WORDS = wordsource.open_words(WORDS_PATH)
 
 FEATURES = [] # list of Feature objects
 
@@ -59,22 +79,31 @@ class Feature(object):
 # Create a string-length feature
 FEATURES.append(Feature("length", 50, len))
 
-# Features for number of vowels and number of consonants
-num_vowels = lambda s: len([c for c in s if c in VOWELS])
-FEATURES.append(Feature("number of occurrences of vowels", 7, num_vowels))
-if TEST:
-    assert FEATURES[-1](("Xu") * 13) == 13
-FEATURES.append(Feature("number of occurrences of consonants", 7, lambda s: len(s) - num_vowels(s)))
-if TEST:
-    assert FEATURES[-1](("Xu") * 13) == 13
-# Features for fraction of word that is vowel vs consonant
-fraction_vowels = lambda s: num_vowels(s) / len(s)
-FEATURES.append(Feature("fraction which is vowels", 7, fraction_vowels))
-if TEST:
-    assert .49 < FEATURES[-1](("Xu") * 13) < .51
-FEATURES.append(Feature("fraction which is consonants", 7, lambda s: 1 - fraction_vowels(s)))
-if TEST:
-    assert .49 < FEATURES[-1](("Xu") * 13) < .51
+def add_vowel_features(vowels, name_suffix, probability_weight):
+    """Adds features for number of vowels and number of consonants, and for fraction
+    of word that is vowel vs consonant, where `vowels` is the set of vowels."""
+    num_vowels = lambda s: len([c for c in s if c in vowels])
+    FEATURES.append(Feature("number of occurrences of vowels" + name_suffix, probability_weight,
+        num_vowels))
+    if TEST:
+        assert FEATURES[-1](("Xu") * 13) == 13
+    FEATURES.append(Feature("number of occurrences of consonants" + name_suffix, probability_weight,
+        lambda s: len(s) - num_vowels(s)))
+    if TEST:
+        assert FEATURES[-1](("Xu") * 13) == 13
+    fraction_vowels = lambda s: num_vowels(s) / len(s)
+    FEATURES.append(Feature("fraction which is vowels" + name_suffix, probability_weight,
+        fraction_vowels))
+    if TEST:
+        assert .49 < FEATURES[-1](("Xu") * 13) < .51
+    FEATURES.append(Feature("fraction which is consonants" + name_suffix, probability_weight,
+        lambda s: 1 - fraction_vowels(s)))
+    if TEST:
+        assert .49 < FEATURES[-1](("Xu") * 13) < .51
+
+# Some rules will consider y to be a vowel! Each variant gets half the weight.
+add_vowel_features(set("aeiou"), "", 7 / 2)
+add_vowel_features(set("aeiouy"), " (with y as a vowel)", 7 / 2)
 
 # Features for number of occurrences of each individual character
 for char in ascii_lowercase:
@@ -89,6 +118,45 @@ for char in ascii_lowercase:
     if TEST:
         assert .49 < FEATURES[-1](("X" + char) * 13) < .51
 
+FEATURE_PROBABILITIES = [feature.probability for feature in FEATURES]
+
+
+# Feature matrices
+########################################################################
+
+feature_cache = OrderedDict()
+    # (index in FEATURES, index in ALL_WORDS) -> that feature's value for that word,
+    # least recently used first
+
+def feature_matrix(features, words, indices=None):
+    """Returns the design matrix of `words` for the given features, one row per word.
+    If `indices` (of the words in ALL_WORDS) are given, feature values are cached by
+    word, so only those not seen recently are computed, and `words` may be None."""
+    if indices is None:
+        return np.array([[feature(word) for feature in features] for word in words], dtype=float)
+    feature_nums = [FEATURES.index(feature) for feature in features]
+    matrix = np.empty((len(indices), len(features)))
+    missing = [] # (row, word index) of rows with some feature not cached
+    for row, i in enumerate(indices):
+        for col, feature_num in enumerate(feature_nums):
+            value = feature_cache.get((feature_num, i))
+            if value is None:
+                missing.append((row, i))
+                break
+            feature_cache.move_to_end((feature_num, i))
+            matrix[row, col] = value
+    if missing:
+        missing_words = ALL_WORDS.words_at([i for row, i in missing]) if words is None \
+                else [words[row] for row, i in missing]
+        for (row, i), word in zip(missing, missing_words):
+            for col, (feature, feature_num) in enumerate(zip(features, feature_nums)):
+                value = matrix[row, col] = feature(word)
+                feature_cache[(feature_num, i)] = value
+                feature_cache.move_to_end((feature_num, i))
+        while len(feature_cache) > FEATURE_CACHE_SIZE:
+            feature_cache.popitem(last=False)
+    return matrix
+
 
 # Rules and related utilities
 ########################################################################
@@ -99,11 +167,13 @@ class BadRuleException(Exception):
 
 class Rule(object):
     """Represents some rule for accepting or rejecting words."""
-    def __init__(self, features, words_to_accept, words_to_reject, difficulty):
+    def __init__(self, features, words_to_accept, words_to_reject, difficulty, training_indices=None):
         """`features`: list of Feature objects
         `words_to_accept`: training points on the 'accept' side of the line
         `words_to_reject`: training points on the 'reject' side of the line
         `difficulty`: game difficulty
+        `training_indices`: optionally, indices in ALL_WORDS of words_to_accept +
+            words_to_reject, so their features can come from the cache
         """
         self.features = features
         self.words_to_accept = words_to_accept
@@ -111,24 +181,40 @@ class Rule(object):
         self.difficulty = difficulty
 
         # Train classifier
-        design_matrix = [self.feature_vector(word) for word in words_to_accept + words_to_reject]
+        self.training_matrix = feature_matrix(features, words_to_accept + words_to_reject,
+                training_indices)
         outputs = [1] * len(words_to_accept) + [0] * len(words_to_reject)
-        self.classifier = SVC(kernel='poly')
+        self.gamma = kernel_gamma(self.training_matrix)
+        self.classifier = SVC(kernel='precomputed')
+            # We use a polynomial kernel, computed by kernel() from cached features.
             # 'rbf' kernel tends to produce small bubbles of accepted/rejected surrounded by rejected/accepted
-        self.classifier.fit(design_matrix, outputs)
+        with profiling.phase("train classifier"):
+            training_predictions = self.classifier.fit(self.kernel(self.training_matrix), outputs) \
+                    .predict(self.kernel(self.training_matrix))
 
         # Check reasonability
-        self.true_positives = [word for word in self.words_to_accept if self(word)]
-        self.true_negatives = [word for word in self.words_to_reject if not self(word)]
+        num_accept = len(words_to_accept)
+        self.true_positives = [word for word, accepted in
+                zip(words_to_accept, training_predictions[:num_accept]) if accepted]
+        self.true_negatives = [word for word, accepted in
+                zip(words_to_reject, training_predictions[num_accept:]) if not accepted]
         if not self.reasonable():
             raise BadRuleException("didn't classify examples reasonably")
 
+    def kernel(self, matrix):
+        """Returns the polynomial kernel between each row of design matrix `matrix`
+        and each training point."""
+        return poly_kernel(matrix, self.training_matrix, self.gamma)
+
+    def predict(self, words, indices=None):
+        """Returns a boolean array of whether each of `words` is accepted. If `indices`
+        (of the words in ALL_WORDS) are given, cached features are used."""
+        return self.classifier.predict(self.kernel(feature_matrix(self.features, words, indices))) \
+                .astype(bool)
+
     def __call__(self, s):
         assert s # else some features could be infinite, and the SVC can't deal with that
-        return self.classifier.predict(self.feature_vector(s))[0]
-
-    def feature_vector(self, word):
-        return [feature(word) for feature in self.features]
+        return bool(self.predict([s])[0])
 
     def __str__(self):
         return ("Rule with feature set (of which likely only some matter):\n\t\t%s\n"
@@ -145,72 +231,63 @@ class Rule(object):
         points we're supposed to.
         If this returns False, it's usually because the features are things like
         'contains letter z', and none of our training points contain 'z'."""
-        n_true_positives = len(self.true_positives)
-        n_false_negatives = len(self.words_to_accept) - n_true_positives
-        n_true_negatives = len(self.true_negatives)
-        n_false_positives = len(self.words_to_reject) - n_true_negatives
-
-        sensitivity = n_true_positives / (n_true_positives + n_false_negatives)
-        specificity = n_true_negatives / (n_true_negatives + n_false_positives)
-
-        if sensitivity < SENSITIVITY_SPECIFICITY_MINIMUM(self.difficulty):
-            return False
-        if specificity < SENSITIVITY_SPECIFICITY_MINIMUM(self.difficulty):
-            return False
-        return True
-
-def random_features(num_features):
+        sensitivity = len(self.true_positives) / len(self.words_to_accept)
+        specificity = len(self.true_negatives) / len(self.words_to_reject)
+        return reasonable_fit(sensitivity, specificity, self.difficulty)
+
+def reasonable_fit(sensitivity, specificity, difficulty):
+    """Returns whether a classifier with the given sensitivity and specificity on its
+    training points is reasonable at this difficulty."""
+    return (sensitivity >= SENSITIVITY_SPECIFICITY_MINIMUM(difficulty)
+            and specificity >= SENSITIVITY_SPECIFICITY_MINIMUM(difficulty))
+
+def kernel_gamma(training_matrix):
+    """Returns the kernel coefficient SVC would choose with gamma='scale'."""
+    variance = training_matrix.var()
+    return 1. / (training_matrix.shape[1] * variance) if variance != 0 else 1.
+
+def poly_kernel(matrix, training_matrix, gamma):
+    """Returns the polynomial kernel between each row of design matrix `matrix` and
+    each row of `training_matrix`."""
+    return (gamma * (matrix @ training_matrix.T)) ** POLY_DEGREE
+
+def random_features(num_features, rng=random):
     """Returns a list of `num_features` distinct features, sampled according
     to the features' probability weights."""
-    available_features = FEATURES[:]
-    chosen_features = []
-    probability_normalizer = sum(feature.probability for feature in FEATURES)
-    for i_feature in range(num_features):
-        sample_real = random() * probability_normalizer
-        for j_feature, feature in enumerate(available_features):
-            sample_real -= feature.probability
-            if sample_real <= 0:
-                chosen_features.append(feature)
-                del available_features[j_feature]
-                break
-        else: # if we never broke out of the for-loop, ie if no feature was chosen
-            raise Exception("somehow failed to sample from feature distribution")
-        probability_normalizer -= chosen_features[-1].probability
-    assert len(chosen_features) == num_features
-    return chosen_features
+    return sampling.sample_without_replacement(FEATURES, FEATURE_PROBABILITIES, num_features, rng)
 
-def random_disjoint_subsets(len_each, arr, num_subsets):
+def random_disjoint_subsets(len_each, arr, num_subsets, rng=random):
     """Returns `num_subsets` disjoint subsets of `arr`, each containing 
     `len_each` elements."""
     assert len_each * num_subsets <= len(arr)
     shuffled_arr = arr[:]
-    shuffle(shuffled_arr)
+    rng.shuffle(shuffled_arr)
     for i in range(num_subsets):
         yield shuffled_arr[i * len_each : (i+1) * len_each]
 
-def random_rule(difficulty):
+def random_rule(difficulty, rng=random):
     """Returns a random rule, with specified difficulty."""
     for i in range(NUM_RANDOM_RULE_TRIES):
         try:
-            words_to_accept, words_to_reject = random_disjoint_subsets(
-                    TRAINING_POINTS_PER_CLASS(difficulty), ALL_WORDS, 2)
-            features = random_features(NUMBER_OF_FEATURES(difficulty))
-            return Rule(features, words_to_accept, words_to_reject, difficulty)
+            training_sample = ALL_WORDS.sample_indexed(2 * TRAINING_POINTS_PER_CLASS(difficulty), rng)
+            to_accept, to_reject = random_disjoint_subsets(
+                    TRAINING_POINTS_PER_CLASS(difficulty), training_sample, 2, rng)
+            features = random_features(NUMBER_OF_FEATURES(difficulty), rng)
+            return Rule(features, [word for i, word in to_accept], [word for i, word in to_reject],
+                    difficulty, [i for i, word in to_accept + to_reject])
         except BadRuleException:
             pass
         if i > 0 and (i % 50) == 0:
             print ("\tFailed to find a good rule in %s tries. This may take a minute." % i)
     raise Exception("could not generate random rule: every one of the NUM_RANDOM_RULE_TRIES tries failed")
 
-def test_random_words(rule, num_words):
+def test_random_words(rule, num_words, rng=random):
     """Test `num_words` random words with the given `rule`, and return those accepted
     and rejected in separate lists."""
-    words_copy = ALL_WORDS[:]
-    shuffle(words_copy)
-    word_sample = words_copy[:num_words]
-    examples_accepted = list(filter(rule, word_sample))
-    examples_rejected = list(filter(lambda w: w not in examples_accepted,
-        word_sample))
+    word_sample = ALL_WORDS.sample_indexed(num_words, rng)
+    accepted = rule.predict([word for i, word in word_sample], [i for i, word in word_sample])
+    examples_accepted = [word for (i, word), a in zip(word_sample, accepted) if a]
+    examples_rejected = [word for (i, word), a in zip(word_sample, accepted) if not a]
     return examples_accepted, examples_rejected
 
 
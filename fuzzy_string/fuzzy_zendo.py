@@ -3,11 +3,31 @@
 # Zendo-like game. Uses fuzzy_rules.py to construct random rules (word classifiers), then allows
 # the user to test the rule or guess how it classifies words.
 
-from random import choice, shuffle, randint
+from random import Random
+from argparse import ArgumentParser
+from getpass import getuser
+from os import path
 import re
+import sys
+import time
 from math import log
 
-import fuzzy_rules as r
+sys.path.append(path.join(path.dirname(path.realpath(__file__)), "..", "shared"))
+import profiling
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Fuzzy String Zendo.")
+    parser.add_argument("--seed", type=int, help="seed for the random number generator, "
+            "to replay the same rule and examples")
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    profiling.start_from_args(args) # before the imports below, so loading them is profiled
+
+with profiling.phase("import"):
+    import fuzzy_rules as r
+    import fuzzy_oracle
+    import gamelog
+    import scoring
 
 # Configuration
 ########################################################################
@@ -19,24 +39,27 @@ NUM_STARTING_EXAMPLES = lambda d: (1 if d == 1 else 2)
     # Number of examples of accepted and rejected (each) to show.
     # This is a function of difficulty.
 
+GAMELOG_PATH = path.join(path.dirname(path.realpath(__file__)), "..", "games.log")
+    # Where finished games are logged, so users can track their statistics.
+
 
 # Global variables
 ########################################################################
 
 known_words = {}
 num_asks = 0 # Number of words the user has asked to see the class of.
+queries = [] # (word, accepted) pairs the user asked about, in order
 
 positive_examples, negative_examples = [], []
+difficulty = None
+rule = None
+start_time = None
+rng = Random() # source of all randomness in the game; seeded by --seed
 
 
-# The actual game
+# Game logic
 ########################################################################
 
-difficulty = int(input("Enter difficulty (1 is easy, 3 is moderate, 5 is difficult): "))
-print("Generating rule...")
-rule = r.random_rule(difficulty)
-print("Generated rule.\n")
-
 def ensure_minimum_examples(num):
     """Ensure that each of positive_examples and negative_examples contain at least
     `num` elements."""
@@ -44,58 +67,38 @@ def ensure_minimum_examples(num):
     global negative_examples
     positive_examples = list(filter(lambda w: w not in known_words, positive_examples))
     negative_examples = list(filter(lambda w: w not in known_words, negative_examples))
-    while len(positive_examples) < num or len(negative_examples) < num:
-        new_accepted, new_rejected = r.test_random_words(rule, 100)
-        positive_examples.extend(filter(lambda w: w not in known_words, new_accepted))
-        negative_examples.extend(filter(lambda w: w not in known_words, new_rejected))
-
-num_starting_examples = NUM_STARTING_EXAMPLES(difficulty)
-ensure_minimum_examples(num_starting_examples)
-print("You are given that these string(s) are accepted: ", 
-    ", ".join(positive_examples[:num_starting_examples]))
-for word in positive_examples[:num_starting_examples]:
-    known_words[word] = True
-print("You are given that these string(s) are rejected: ", 
-    ", ".join(negative_examples[:num_starting_examples]))
-for word in negative_examples[:num_starting_examples]:
-    known_words[word] = False
+    with profiling.phase("draw examples"):
+        while len(positive_examples) < num or len(negative_examples) < num:
+            new_accepted, new_rejected = r.test_random_words(rule, 100, rng)
+            positive_examples.extend(filter(lambda w: w not in known_words, new_accepted))
+            negative_examples.extend(filter(lambda w: w not in known_words, new_rejected))
 
 def test_user_GOTIT():
     """Test the user after he claims GOTIT.
-    Returns the user's log score."""
+    Returns the user's log score, and that of the oracle's credences given the same
+    known classifications, with the effective number of candidate rules those
+    credences came from."""
 
     num_tests = NUM_TESTS(difficulty)
     print("\nYou will be asked to judge %s strings. For each one, enter your belief that the string" % num_tests)
     print("will be accepted, from 0 to 1 (e.g. .5).")
-    num_to_accept = randint(0, num_tests-2) + 1
+    num_to_accept = rng.randint(0, num_tests-2) + 1
         # this ensures we always get at least 1 accepted and 1 rejected, to prevent
         # user from just guessing based on the base rate.
     num_to_reject = num_tests - num_to_accept
 
     ensure_minimum_examples(max(num_to_accept, num_to_reject))
-    shuffle(positive_examples)
-    shuffle(negative_examples)
+    rng.shuffle(positive_examples)
+    rng.shuffle(negative_examples)
     words_to_test = positive_examples[:num_to_accept] + negative_examples[:num_to_reject]
-    shuffle(words_to_test)
+    rng.shuffle(words_to_test)
     assert len(words_to_test) == num_tests 
 
     actually_accepted = []
     probabilities_of_correct = []
     for word in words_to_test:
         print()
-        guess = -1
-        while True:
-            try:
-                print("Test this word:  %s" % word)
-                guess_str = input("Enter your belief that the true rule accepts this word, "
-                    "from 0 to 1: ").strip()
-                guess = float(guess_str)
-                if guess > 1 or guess < 0:
-                    raise ValueError()
-                break
-            except ValueError: # if user entered something that's not a valid probability
-                print("String must represent a valid probability.")
-                # try again
+        guess = scoring.read_credence(word)
         accepted = (word in positive_examples)
         probabilities_of_correct.append(guess if accepted else 1. - guess)
         actually_accepted.append(accepted)
@@ -103,42 +106,96 @@ def test_user_GOTIT():
     print("\nThe true rule classified those words as follows respectively:")
     print("\t", ", ".join(map((lambda x: "ACCEPTED" if x else "REJECTED"), actually_accepted)))
 
-    if 0 in probabilities_of_correct:
-        log_score = float("-inf")
-    else:
-        log_score = sum(log(prob) for prob in probabilities_of_correct)
-
-    return log_score
-
-
-# Main game loop
-while True:
+    print("\nWorking out the best credences you could have given...")
+    with profiling.phase("oracle"):
+        oracle_credences, num_candidates = fuzzy_oracle.credences(known_words, words_to_test,
+                difficulty, time_limit=fuzzy_oracle.TIME_LIMIT, rng=rng)
+    oracle_probabilities_of_correct = [p if accepted else 1. - p
+            for p, accepted in zip(oracle_credences, actually_accepted)]
+
+    return (scoring.log_score(probabilities_of_correct),
+            scoring.log_score(oracle_probabilities_of_correct), num_candidates)
+
+def log_game(outcome, log_score=None):
+    """Saves the finished game to the game log, and shows the user's record at this
+    difficulty."""
+    record = gamelog.GameRecord("fuzzy", getuser(), time.time(), difficulty, str(rule), queries,
+            time.time() - start_time, outcome, log_score)
+    with profiling.phase("log game"), gamelog.GameLog(GAMELOG_PATH) as log:
+        log.append(record)
+        stats = log.stats(game="fuzzy", player=record.player, difficulty=difficulty)
+    if stats.num_log_scores:
+        print("\nAt difficulty %s you have played %s games, with mean log score %s." %
+                (difficulty, stats.count, round(stats.mean_log_score, 5)))
+    else: # every game so far was given up
+        print("\nAt difficulty %s you have played %s games, with no scored games yet." %
+                (difficulty, stats.count))
+
+
+def main_game_loop():
+    """Main loop of the game. User can test string, give up, or claim to know rule.
+    Returns True if another round is needed, False otherwise."""
     command = input("\nEnter lowercase string to test, or GIVEUP to give up, or GOTIT if you "
             "think you know the rule.\n> ").rstrip('\n')
+    global num_asks
     if command == "GIVEUP":
         print("\nThe rule was:")
         print(str(rule))
-        break
+        log_game("gave up")
+        return False
     elif command == "GOTIT":
-        log_score = test_user_GOTIT()
+        log_score, oracle_log_score, num_candidates = test_user_GOTIT()
 
         print("\nThe rule was:")
         print(str(rule))
 
         print("\nYour log score was %s (more is better); guessing .5 each time would have given %s." %
                 (round(log_score, 5), round(log(.5) * NUM_TESTS(difficulty), 2)))
+        if num_candidates >= fuzzy_oracle.MIN_CANDIDATES:
+            print("The best credences given the classifications you knew would have scored about %s"
+                    " (estimated from %s likely rules)." % (round(oracle_log_score, 2), round(num_candidates)))
+        else:
+            print("Too few likely rules were found in time to estimate the best credences"
+                    " given the classifications you knew.")
         print("Difficulty was %s and you tested %s words." % (difficulty, num_asks))
 
         print("\nKnown classifications at the time you typed GOTIT were:")
         for k, v in known_words.items():
             print("\t" + k.ljust(30) + " : " + ("accepted" if v else "rejected"))
-        break
+        log_game("scored", log_score)
+        return False
     else: # command is a string to test
         if re.match("^[a-z]+$", command) is None:
             print("Invalid. Enter nonempty lowercase string consisting of only a-z, or GIVEUP, or GOTIT.")
         else:
             accepted = rule(command)
             known_words[command] = accepted
+            queries.append((command, accepted))
             print("String %r is:  %s" % (command, ("ACCEPTED" if accepted else "REJECTED")))
             num_asks += 1
-
+        return True
+
+
+if __name__ == "__main__":
+    rng = Random(args.seed)
+
+    difficulty = int(input("Enter difficulty (1 is easy, 3 is moderate, 5 is difficult): "))
+    print("Generating rule...")
+    with profiling.phase("generate rule"):
+        rule = r.random_rule(difficulty, rng)
+    print("Generated rule.\n")
+
+    num_starting_examples = NUM_STARTING_EXAMPLES(difficulty)
+    ensure_minimum_examples(num_starting_examples)
+    print("You are given that these string(s) are accepted: ",
+        ", ".join(positive_examples[:num_starting_examples]))
+    for word in positive_examples[:num_starting_examples]:
+        known_words[word] = True
+    print("You are given that these string(s) are rejected: ",
+        ", ".join(negative_examples[:num_starting_examples]))
+    for word in negative_examples[:num_starting_examples]:
+        known_words[word] = False
+
+    start_time = time.time()
+    while main_game_loop():
+        pass # loop while it returns True
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+
+import random
+import unittest
+
+import numpy as np
+
+import fuzzy_oracle as o
+
+class TestPosterior(unittest.TestCase):
+    def test_down_weights_misclassifiers(self):
+        # 10 candidates get both known words right and accept the new word; 10 get one
+        # known word wrong and reject it
+        right = [[True, False, True]] * 10
+        wrong = [[False, False, False]] * 10
+        credences, num_candidates = o.posterior(np.array(right + wrong), np.array([True, False]))
+        self.assertGreater(credences[0], .9)
+        self.assertLess(num_candidates, 11)
+        self.assertGreater(num_candidates, 10)
+    def test_no_candidates(self):
+        credences, num_candidates = o.posterior(np.zeros((0, 5), dtype=bool),
+                np.array([True, False]))
+        np.testing.assert_array_equal(credences, [.5, .5, .5])
+        self.assertEqual(num_candidates, 0)
+    def test_never_certain(self):
+        accepted = np.array([[True, True, False]] * 20)
+        credences, num_candidates = o.posterior(accepted, np.array([True]))
+        self.assertEqual(num_candidates, 20)
+        self.assertTrue(np.all((0 < credences) & (credences < 1)))
+        self.assertAlmostEqual(credences[0], 20.5 / 21)
+        self.assertAlmostEqual(credences[1], .5 / 21)
+
+class TestCredences(unittest.TestCase):
+    def test_reproducible(self):
+        known_words = {"cat": True, "elephant": False}
+        words = ["dog", "hippopotamus", "a"]
+        def run():
+            return o.credences(known_words, words, 1, num_candidates=30, processes=1,
+                    rng=random.Random(0))
+        credences, num_candidates = run()
+        self.assertEqual(len(credences), 3)
+        self.assertTrue(np.all((0 < credences) & (credences < 1)))
+        self.assertGreater(num_candidates, 0)
+        again, num_again = run()
+        np.testing.assert_array_equal(credences, again)
+        self.assertEqual(num_candidates, num_again)
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+
+import random
+import unittest
+
+import numpy as np
+from sklearn.svm import SVC
+
+import fuzzy_rules as r
+
+class TestFeatureMatrix(unittest.TestCase):
+    def test_cached_values(self):
+        features = r.random_features(5, random.Random(0))
+        sample = r.ALL_WORDS.sample_indexed(50, random.Random(1))
+        indices = [i for i, word in sample]
+        words = [word for i, word in sample]
+        expected = r.feature_matrix(features, words)
+        np.testing.assert_array_equal(r.feature_matrix(features, None, indices), expected)
+        np.testing.assert_array_equal(r.feature_matrix(features, words, indices), expected)
+        more_features = features + r.random_features(3, random.Random(2))
+        np.testing.assert_array_equal(r.feature_matrix(more_features, None, indices[::-1]),
+                r.feature_matrix(more_features, words[::-1]))
+        self.assertLessEqual(len(r.feature_cache), r.FEATURE_CACHE_SIZE)
+
+class TestRule(unittest.TestCase):
+    def test_matches_poly_svc(self):
+        rng = random.Random(2)
+        for difficulty in (1, 3, 5):
+            rule = r.random_rule(difficulty, rng)
+            reference = SVC(kernel='poly', degree=r.POLY_DEGREE, gamma='scale', coef0=0.).fit(
+                    r.feature_matrix(rule.features, rule.words_to_accept + rule.words_to_reject),
+                    [1] * len(rule.words_to_accept) + [0] * len(rule.words_to_reject))
+            sample = r.ALL_WORDS.sample_indexed(500, rng)
+            words = [word for i, word in sample]
+            matrix = r.feature_matrix(rule.features, words)
+            predicted = rule.predict(words, [i for i, word in sample])
+            # the kernels agree up to rounding, so only words next to the boundary may differ
+            differing = predicted != reference.predict(matrix).astype(bool)
+            self.assertLess(np.abs(reference.decision_function(matrix)[differing]).max(initial=0), 1e-6)
+    def test_random_words(self):
+        rule = r.random_rule(2, random.Random(3))
+        accepted, rejected = r.test_random_words(rule, 100, random.Random(4))
+        self.assertEqual(len(accepted) + len(rejected), 100)
+        self.assertTrue(all(rule(word) for word in accepted))
+        self.assertFalse(any(rule(word) for word in rejected))
+
+
+if __name__ == "__main__":
+	unittest.main()
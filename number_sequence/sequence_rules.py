@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+
+# Rules for Number Sequence Zendo, where the strings are sequences of three numbers from
+# 1 to 100 (as in the classic 2-4-6 task). This mirrors the rule framework of
+# rigid_string/rules.py, but since there are only 10^6 sequences, every rule is also
+# evaluated exactly over all of them: its mask is a NumPy array of 10^6 packed bits
+# (125 KB), one per sequence. Reasonability, picking examples and finding sequences
+# that distinguish two rules are then exact bitwise operations.
+
+from collections import OrderedDict
+from os import path
+import random
+import sys
+
+import numpy as np
+
+sys.path.append(path.join(path.dirname(path.realpath(__file__)), "..", "shared"))
+import sampling
+
+
+# Configuration
+########################################################################
+
+NUMBER_MAX = 100 # numbers in sequences range from 1 to this
+SEQUENCE_LENGTH = 3
+
+REASONABILITY_MIN_FRACTION = .005 # minimum fraction of all sequences a rule must accept to be "reasonable"
+REASONABILITY_MAX_FRACTION = .995 # maximum fraction of all sequences a rule may accept to be "reasonable"
+
+MASK_CACHE_SIZE = 256 # number of rules' masks to keep cached, at 125 KB each
+
+NUM_TRIES = 100 # number of times to try generating various rules randomly before giving up
+
+# Every function here that needs randomness takes an `rng` argument, which should be a
+# random.Random instance. It defaults to the random module itself, i.e. the global stream.
+
+
+# Constants and globals
+########################################################################
+
+SPACE_SIZE = NUMBER_MAX ** SEQUENCE_LENGTH # number of possible sequences
+
+ORDINALS = ["first", "second", "third"]
+
+POPCOUNTS = np.array([bin(byte).count("1") for byte in range(256)], dtype=np.uint8)
+
+mask_cache = OrderedDict() # least-recently-used cache of rules' masks, by description
+
+_columns = None
+
+concrete_rules = []
+def register_concrete_rule(cls):
+    """Decorator to register a concrete subclass of Rule.
+    This is used when generating random rules."""
+    global concrete_rules
+    concrete_rules.append(cls)
+    return cls
+
+
+# The space of sequences
+########################################################################
+
+def index_to_sequence(i):
+    """Returns the sequence whose bit in masks is bit `i`."""
+    sequence = []
+    for position in range(SEQUENCE_LENGTH):
+        i, number = divmod(i, NUMBER_MAX)
+        sequence.append(number + 1)
+    return tuple(reversed(sequence))
+
+def sequence_to_index(sequence):
+    i = 0
+    for number in sequence:
+        i = i * NUMBER_MAX + number - 1
+    return i
+
+def columns():
+    """Returns one array per position in the sequence, holding the number at that
+    position of each of the sequences, in mask order."""
+    global _columns
+    if _columns is None:
+        indices = np.arange(SPACE_SIZE)
+        _columns = tuple(((indices // NUMBER_MAX ** (SEQUENCE_LENGTH - 1 - position)) % NUMBER_MAX
+                + 1).astype(np.int16) for position in range(SEQUENCE_LENGTH))
+    return _columns
+
+def popcount(mask):
+    """Number of sequences in `mask`."""
+    return int(POPCOUNTS[mask].sum(dtype=np.int64))
+
+def sample_sequences(mask, num, rng=random):
+    """Returns up to `num` distinct random sequences from `mask`."""
+    indices = np.flatnonzero(np.unpackbits(mask))
+    return [index_to_sequence(int(indices[i]))
+            for i in rng.sample(range(len(indices)), min(num, len(indices)))]
+
+def distinguishing_sequences(rule1, rule2, num, rng=random):
+    """Returns up to `num` random sequences which exactly one of the rules accepts."""
+    return sample_sequences(np.bitwise_xor(rule1.mask(), rule2.mask()), num, rng)
+
+
+# Rule classes etc.
+########################################################################
+
+class IncorrectComplexity(Exception):
+    """Raised when some rule failed to be created because it was given
+    a complexity too small or too big."""
+    pass
+
+class Rule(object):
+    """Abstract base class for rules that determine whether sequences
+    are legal or illegal."""
+    __slots__ = ()
+    probability_weight = .5 # this determines how often random_rule()
+        # chooses this rule. It's normalized to a categorical
+        # distribution over concrete rule classes.
+    def __call__(self, sequence):
+        """This should return whether or not the given sequence
+        is legal according to this Rule."""
+        raise NotImplementedError("abstract base class")
+    def bool_mask(self):
+        """Returns a NumPy boolean array saying, for each sequence in mask order,
+        whether this rule accepts it. Leaf rules should implement this."""
+        raise NotImplementedError("abstract base class")
+    def compute_mask(self):
+        return np.packbits(self.bool_mask())
+    def mask(self):
+        """Returns this rule's mask: a packed bit array of which sequences it accepts.
+        Masks are cached."""
+        key = str(self)
+        mask = mask_cache.get(key)
+        if mask is None:
+            mask = self.compute_mask()
+            mask_cache[key] = mask
+            if len(mask_cache) > MASK_CACHE_SIZE:
+                mask_cache.popitem(last=False)
+        else:
+            mask_cache.move_to_end(key)
+        return mask
+    @classmethod
+    def get_random(cls, complexity, rng=random):
+        """Creates and returns a random instance of this class.
+        Resulting rule should have complexity commensurate with
+        `complexity`."""
+        raise NotImplementedError()
+    def accept_fraction(self):
+        return popcount(self.mask()) / SPACE_SIZE
+    def reasonable(self):
+        """Returns whether this rule is "reasonable", meaning that it
+        neither accepts nor rejects almost all sequences. This is exact."""
+        return REASONABILITY_MIN_FRACTION <= self.accept_fraction() <= REASONABILITY_MAX_FRACTION
+    def subrules(self):
+        """Returns the rules this rule is built from."""
+        return ()
+    def neighbours(self):
+        """Returns a list of rules that differ from this one by one small change."""
+        return []
+
+rule_classes = sampling.ClassSampler(concrete_rules) # concrete rules, by probability_weight
+
+def random_rule(complexity, forbidden_classes=None, top_level=False, rng=random):
+    """Generates a random rule, which behaves reasonably, e.g.
+    doesn't accept or reject an overwhelming majority of sequences."""
+    if complexity < 1:
+        raise IncorrectComplexity()
+    if forbidden_classes is None:
+        forbidden_classes = []
+    sampler = rule_classes.excluding(forbidden_classes)
+    try_limit = (1000 if top_level else 100)
+    for try_num in range(1, try_limit):
+        try:
+            ret_rule = sampler.sample(rng).get_random(complexity, rng)
+            if ret_rule.reasonable():
+                return ret_rule
+        except IncorrectComplexity:
+            pass # try next rule
+    raise IncorrectComplexity("could not generate legal rule")
+
+class CombinationRule(Rule):
+    """Abstract base class for rules which work by combining two
+    simpler rules."""
+    __slots__ = ("test1", "test2")
+    name = "(CombinationRule name)"
+    combining_complexity = 1 # Complexity of the combination rule itself, added to combinands' complexities
+    def combin_func(self, x, y):
+        raise NotImplementedError()
+    def combin_mask(self, x, y):
+        """combin_func, applied to masks."""
+        raise NotImplementedError()
+    def __init__(self, test1, test2):
+        self.test1 = test1
+        self.test2 = test2
+    def __call__(self, sequence):
+        return self.combin_func(self.test1(sequence), self.test2(sequence))
+    def __str__(self):
+        return "(%s) %s (%s)" % (str(self.test1), self.name, str(self.test2))
+    def compute_mask(self):
+        return self.combin_mask(self.test1.mask(), self.test2.mask())
+    def subrules(self):
+        return (self.test1, self.test2)
+    def neighbours(self):
+        return ([self.test1, self.test2]
+                + [type(self)(n, self.test2) for n in self.test1.neighbours()]
+                + [type(self)(self.test1, n) for n in self.test2.neighbours()])
+    @classmethod
+    def get_random(cls, complexity, rng=random):
+        if complexity < (1 + 1 + cls.combining_complexity):
+            raise IncorrectComplexity()
+        left_complexity = rng.randint(1, complexity - 1 - cls.combining_complexity)
+        right_complexity = complexity - cls.combining_complexity - left_complexity
+        for i in range(NUM_TRIES):
+            try:
+                left_part = random_rule(left_complexity, rng=rng)
+                right_part = random_rule(right_complexity,
+                        cls.forbidden_classes().get(left_part.__class__, []), rng=rng)
+                return cls(left_part, right_part)
+            except IncorrectComplexity:
+                continue
+        raise IncorrectComplexity()
+    def forbidden_classes():
+        """Returns a dict mapping from the class of the left subtree to a list
+        of classes the right subtree can't have."""
+        return {SumMinimumRule: [SumMinimumRule],
+                MultipleRule: [MultipleRule],
+                AscendingRule: [AscendingRule, ComparisonRule],
+                DistinctRule: [DistinctRule]}
+
+@register_concrete_rule
+class ConjunctionRule(CombinationRule):
+    __slots__ = ()
+    name = "and"
+    probability_weight = .2
+    def combin_func(self, x, y):
+        return x and y
+    def combin_mask(self, x, y):
+        return np.bitwise_and(x, y)
+
+@register_concrete_rule
+class DisjunctionRule(CombinationRule):
+    __slots__ = ()
+    name = "or"
+    probability_weight = .2
+    def combin_func(self, x, y):
+        return x or y
+    def combin_mask(self, x, y):
+        return np.bitwise_or(x, y)
+
+@register_concrete_rule
+class XorRule(CombinationRule):
+    __slots__ = ()
+    name = "xor"
+    probability_weight = .1
+    combining_complexity = 2
+    def combin_func(self, x, y):
+        return (x or y) and not (x and y)
+    def combin_mask(self, x, y):
+        return np.bitwise_xor(x, y)
+    def forbidden_classes():
+        return {}
+
+@register_concrete_rule
+class NegationRule(Rule):
+    """Rule that negates some other rule."""
+    __slots__ = ("test",)
+    probability_weight = .3
+    def __init__(self, test):
+        self.test = test
+    def __call__(self, sequence):
+        return not self.test(sequence)
+    def __str__(self):
+        return "not (%s)" % str(self.test)
+    def compute_mask(self):
+        return np.bitwise_not(self.test.mask()) # SPACE_SIZE is a multiple of 8, so no padding bits
+    def subrules(self):
+        return (self.test,)
+    def neighbours(self):
+        return [type(self)(n) for n in self.test.neighbours()]
+    @classmethod
+    def get_random(cls, complexity, rng=random):
+        forbidden_classes = [NegationRule, ConjunctionRule, DisjunctionRule, XorRule]
+            # Disallow CombinationRules - e.g. we rather represent not(A and B) as (not A) or (not B)
+        for i in range(NUM_TRIES):
+            try:
+                return cls(random_rule(complexity, forbidden_classes, rng=rng))
+            except IncorrectComplexity:
+                pass
+        raise IncorrectComplexity()
+
+@register_concrete_rule
+class AscendingRule(Rule):
+    """Rule: each number must be bigger than the one before, e.g. 2 4 6."""
+    __slots__ = ()
+    probability_weight = .3
+    def __call__(self, sequence):
+        return all(x < y for x, y in zip(sequence, sequence[1:]))
+    def __str__(self):
+        return "each number is bigger than the one before"
+    def bool_mask(self):
+        cols = columns()
+        mask = np.ones(SPACE_SIZE, dtype=bool)
+        for x, y in zip(cols, cols[1:]):
+            mask &= x < y
+        return mask
+    @classmethod
+    def get_random(cls, complexity, rng=random):
+        if complexity != 2:
+            raise IncorrectComplexity()
+        return cls()
+
+@register_concrete_rule
+class ComparisonRule(Rule):
+    """Rule: the number at one position must be smaller than the number
+    at another."""
+    __slots__ = ("smaller", "bigger")
+    probability_weight = .3
+    def __init__(self, smaller, bigger):
+        self.smaller = smaller
+        self.bigger = bigger
+    def __call__(self, sequence):
+        return sequence[self.smaller] < sequence[self.bigger]
+    def __str__(self):
+        return "the %s number is smaller than the %s" % (ORDINALS[self.smaller], ORDINALS[self.bigger])
+    def bool_mask(self):
+        cols = columns()
+        return cols[self.smaller] < cols[self.bigger]
+    def neighbours(self):
+        return [type(self)(self.bigger, self.smaller)]
+    @classmethod
+    def get_random(cls, complexity, rng=random):
+        if complexity != 1:
+            raise IncorrectComplexity()
+        return cls(*rng.sample(range(SEQUENCE_LENGTH), 2))
+
+@register_concrete_rule
+class ArithmeticRule(Rule):
+    """Rule: the numbers must be evenly spaced, e.g. 3 7 11 or 9 6 3."""
+    __slots__ = ()
+    probability_weight = .15
+    def __call__(self, sequence):
+        return len(set(y - x for x, y in zip(sequence, sequence[1:]))) <= 1
+    def __str__(self):
+        return "the numbers are evenly spaced"
+    def bool_mask(self):
+        cols = columns()
+        mask = np.ones(SPACE_SIZE, dtype=bool)
+        for x, y, z in zip(cols, cols[1:], cols[2:]):
+            mask &= (y - x) == (z - y)
+        return mask
+    @classmethod
+    def get_random(cls, complexity, rng=random):
+        if complexity != 3:
+            raise IncorrectComplexity()
+        return cls()
+
+@register_concrete_rule
+class DistinctRule(Rule):
+    """Rule: the numbers must all be different."""
+    __slots__ = ()
+    probability_weight = .1
+    def __call__(self, sequence):
+        return len(set(sequence)) == len(sequence)
+    def __str__(self):
+        return "the numbers are all different"
+    def bool_mask(self):
+        cols = columns()
+        mask = np.ones(SPACE_SIZE, dtype=bool)
+        for i in range(SEQUENCE_LENGTH):
+            for j in range(i + 1, SEQUENCE_LENGTH):
+                mask &= cols[i] != cols[j]
+        return mask
+    @classmethod
+    def get_random(cls, complexity, rng=random):
+        if complexity != 1:
+            raise IncorrectComplexity()
+        return cls()
+
+@register_concrete_rule
+class MultipleRule(Rule):
+    """Rule: every number must be a multiple of N."""
+    __slots__ = ("divisor",)
+    probability_weight = .2
+    divisors = (2, 3, 5)
+    def __init__(self, divisor):
+        self.divisor = divisor
+    def __call__(self, sequence):
+        return all(x % self.divisor == 0 for x in sequence)
+    def __str__(self):
+        return "every number is a multiple of %r" % self.divisor
+    def bool_mask(self):
+        mask = np.ones(SPACE_SIZE, dtype=bool)
+        for col in columns():
+            mask &= col % self.divisor == 0
+        return mask
+    def neighbours(self):
+        return [type(self)(divisor) for divisor in self.divisors if divisor != self.divisor]
+    @classmethod
+    def get_random(cls, complexity, rng=random):
+        if complexity != 2:
+            raise IncorrectComplexity()
+        return cls(rng.choice(cls.divisors))
+
+@register_concrete_rule
+class ElementMinimumRule(Rule):
+    """Rule: the number at some position must be at least N."""
+    __slots__ = ("position", "limit")
+    probability_weight = .3
+    def __init__(self, position, limit):
+        self.position = position
+        self.limit = limit
+    def __call__(self, sequence):
+        return sequence[self.position] >= self.limit
+    def __str__(self):
+        return "the %s number is at least %r" % (ORDINALS[self.position], self.limit)
+    def bool_mask(self):
+        return columns()[self.position] >= self.limit
+    def neighbours(self):
+        return [type(self)(self.position, limit) for limit in (self.limit - 1, self.limit + 1)
+                if 1 <= limit <= NUMBER_MAX]
+    @classmethod
+    def get_random(cls, complexity, rng=random):
+        if not (1 <= complexity <= 2):
+            raise IncorrectComplexity()
+        return cls(rng.randrange(SEQUENCE_LENGTH), rng.randint(1, 9) * NUMBER_MAX // 10)
+
+@register_concrete_rule
+class SumMinimumRule(Rule):
+    """Rule: the numbers must add up to at least N."""
+    __slots__ = ("limit",)
+    probability_weight = .2
+    def __init__(self, limit):
+        self.limit = limit
+    def __call__(self, sequence):
+        return sum(sequence) >= self.limit
+    def __str__(self):
+        return "the numbers add up to at least %r" % self.limit
+    def bool_mask(self):
+        return sum(columns()) >= self.limit
+    def neighbours(self):
+        return [type(self)(self.limit - 1), type(self)(self.limit + 1)]
+    @classmethod
+    def get_random(cls, complexity, rng=random):
+        if complexity != 2:
+            raise IncorrectComplexity()
+        return cls(rng.randint(5, 25) * SEQUENCE_LENGTH * NUMBER_MAX // 30)
+
+
+if __name__ == "__main__":
+    raise Exception("Not intended to be called standalone.")
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+
+# Zendo-like game on sequences of three numbers, like the classic 2-4-6 task; uses
+# sequence_rules.py to construct rules and then lets user test or guess the rule.
+
+from random import Random
+from argparse import ArgumentParser
+from getpass import getuser
+from os import path
+import re
+import sys
+import time
+
+import numpy as np
+
+import sequence_rules as rules
+sys.path.append(path.join(path.dirname(path.realpath(__file__)), "..", "shared"))
+import gamelog
+
+
+# Configuration
+########################################################################
+
+NUM_TESTS = lambda d: 3 + int(d/2)
+    # Number of sequences to test when the user claims GOTIT. This is a function of difficulty.
+
+NUM_DISTINGUISHING_TESTS = lambda d: NUM_TESTS(d) // 2
+    # How many of those are chosen to tell the rule apart from similar rules.
+
+GAMELOG_PATH = path.join(path.dirname(path.realpath(__file__)), "..", "games.log")
+    # Where finished games are logged, so users can track their statistics.
+
+
+# Global variables
+########################################################################
+
+known_sequences = {}
+num_asks = 0
+queries = [] # (sequence, accepted) pairs the user asked about, in order
+difficulty = None
+start_time = None
+rng = Random() # source of all randomness in the game; seeded by --seed
+
+
+# Game logic
+########################################################################
+
+def format_sequence(sequence):
+    return " ".join(map(str, sequence))
+
+def parse_sequence(command):
+    """Returns the sequence the user entered, or None if it isn't valid."""
+    if re.match(r"^\s*\d+([\s,]+\d+)*\s*$", command) is None:
+        return None
+    sequence = tuple(int(number) for number in re.split(r"[\s,]+", command.strip()))
+    if len(sequence) != rules.SEQUENCE_LENGTH or not all(1 <= x <= rules.NUMBER_MAX for x in sequence):
+        return None
+    return sequence
+
+def choose_tests(num_tests):
+    """Returns a dict from sequences to test to whether the rule accepts them. Some
+    are chosen to tell the rule apart from similar rules, and the rest are random,
+    with at least 1 accepted and 1 rejected."""
+    tests = {}
+    neighbours = rule.neighbours()
+    rng.shuffle(neighbours)
+    for neighbour in neighbours:
+        if len(tests) >= NUM_DISTINGUISHING_TESTS(difficulty):
+            break
+        for sequence in rules.distinguishing_sequences(rule, neighbour, 5, rng):
+            if sequence not in known_sequences and sequence not in tests:
+                tests[sequence] = rule(sequence)
+                break
+    num_to_accept = max(1, rng.randint(0, num_tests - len(tests) - 1))
+    num_to_reject = num_tests - len(tests) - num_to_accept
+    accepted = rule.mask()
+    rejected = np.bitwise_not(accepted)
+    for mask, num, result in ((accepted, num_to_accept, True), (rejected, num_to_reject, False)):
+        candidates = [sequence for sequence in rules.sample_sequences(mask, num + 2 * len(known_sequences) + 10, rng)
+                if sequence not in known_sequences and sequence not in tests]
+        for sequence in candidates[:num]:
+            tests[sequence] = result
+    return tests
+
+def test_user_GOTIT():
+    """Test the user after they claim GOTIT.
+    Returns whether user won (i.e. got all tests right).
+    """
+
+    num_tests = NUM_TESTS(difficulty)
+    print("You will be asked to judge %s sequences. Judge all of them correctly (as the rule would)" % num_tests)
+    print("and you win, but get any wrong and you lose.")
+    tests = list(choose_tests(num_tests).items())
+    rng.shuffle(tests)
+
+    for sequence, correct_classification in tests:
+        guess = "(none)"
+        print()
+        while guess not in "AR":
+            guess = input("Test this sequence:  %s\nEnter A to accept, or R to reject: " %
+                    format_sequence(sequence)).strip()
+        guess = (guess == "A")
+        if correct_classification == guess:
+            print("Correct.")
+        else:
+            print("Incorrect! The rule actually " + ("ACCEPTS" if correct_classification else "REJECTS")
+                    + " this sequence.")
+            return False
+    return True
+
+def log_game(outcome):
+    """Saves the finished game to the game log, and shows the user's record at this
+    difficulty."""
+    record = gamelog.GameRecord("sequence", getuser(), time.time(), difficulty, str(rule),
+            [(format_sequence(sequence), accepted) for sequence, accepted in queries],
+            time.time() - start_time, outcome, None)
+    with gamelog.GameLog(GAMELOG_PATH) as log:
+        log.append(record)
+        stats = log.stats(game="sequence", player=record.player, difficulty=difficulty)
+    print("\nAt difficulty %s you have won %s of %s games, testing %.1f sequences on average." %
+            (difficulty, stats.num("won"), stats.count, stats.mean_queries))
+
+def main_game_loop():
+    """Main loop of the game. User can test a sequence, give up, or claim to know rule.
+    Returns True if another round is needed, False otherwise."""
+    command = input("\nEnter a sequence of %s numbers from 1 to %s to test (e.g. 2 4 6), or GIVEUP to "
+            "give up, or GOTIT if you think you know the rule.\n> " %
+            (rules.SEQUENCE_LENGTH, rules.NUMBER_MAX)).rstrip('\n')
+    global num_asks
+    if command == "GIVEUP":
+        print("\nThe rule was:  ", str(rule))
+        log_game("gave up")
+        return False
+    elif command == "GOTIT":
+        won = test_user_GOTIT()
+        if won:
+            print("\nYOU WIN!! :D")
+        else:
+            print("\nYou lose :(")
+
+        print("\nThe rule was:  ", str(rule))
+
+        print("\nDifficulty was %s and you tested %s sequences." % (difficulty, num_asks))
+        print("Known classifications at the time you typed GOTIT were:")
+        for k, v in known_sequences.items():
+            print("\t" + format_sequence(k).ljust(30) + " : " + ("accepted" if v else "rejected"))
+        log_game("won" if won else "lost")
+        return False
+    else: # command is a sequence to test
+        sequence = parse_sequence(command)
+        if sequence is None:
+            print("Invalid. Enter %s numbers from 1 to %s, or GIVEUP, or GOTIT." %
+                    (rules.SEQUENCE_LENGTH, rules.NUMBER_MAX))
+        else:
+            accepted = rule(sequence)
+            known_sequences[sequence] = accepted
+            queries.append((sequence, accepted))
+            print("Sequence %s is:  %s" % (format_sequence(sequence), ("ACCEPTED" if accepted else "REJECTED")))
+            num_asks += 1
+        return True
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Number Sequence Zendo.")
+    parser.add_argument("--seed", type=int, help="seed for the random number generator, "
+            "to replay the same rule and examples")
+    args = parser.parse_args()
+    rng = Random(args.seed)
+
+    difficulty = int(input("Enter rule complexity (2 is easy, 4 is moderate, 7 is difficult): "))
+    print("Generating rule...")
+    rule = rules.random_rule(difficulty, top_level=True, rng=rng)
+    print("Generated rule.")
+
+    if rule((2, 4, 6)):
+        example_accepted = (2, 4, 6)
+    else:
+        example_accepted = rules.sample_sequences(rule.mask(), 1, rng)[0]
+    known_sequences[example_accepted] = True
+    example_rejected = rules.sample_sequences(np.bitwise_not(rule.mask()), 1, rng)[0]
+    known_sequences[example_rejected] = False
+    print("\nExample of ACCEPTED sequence: %s"   % format_sequence(example_accepted))
+    print(  "Example of REJECTED sequence: %s\n" % format_sequence(example_rejected))
+
+    start_time = time.time()
+    while main_game_loop():
+        pass # loop while it returns True
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+import random
+import unittest
+
+import numpy as np
+
+import sequence_rules as s
+
+class TestSequenceSpace(unittest.TestCase):
+    def test_index_round_trip(self):
+        for sequence in ((1, 1, 1), (2, 4, 6), (100, 1, 37), (100, 100, 100)):
+            self.assertEqual(s.index_to_sequence(s.sequence_to_index(sequence)), sequence)
+        self.assertEqual(s.sequence_to_index((100, 100, 100)), s.SPACE_SIZE - 1)
+    def test_columns(self):
+        i = s.sequence_to_index((3, 58, 91))
+        self.assertEqual([int(column[i]) for column in s.columns()], [3, 58, 91])
+
+class TestRules(unittest.TestCase):
+    def test_call(self):
+        self.assertTrue(s.AscendingRule()((2, 4, 6)))
+        self.assertFalse(s.AscendingRule()((2, 2, 6)))
+        self.assertTrue(s.ArithmeticRule()((9, 6, 3)))
+        self.assertFalse(s.ArithmeticRule()((1, 2, 4)))
+        self.assertTrue(s.ComparisonRule(0, 2)((5, 1, 6)))
+        self.assertFalse(s.ComparisonRule(2, 0)((5, 1, 6)))
+        self.assertFalse(s.DistinctRule()((5, 1, 5)))
+        self.assertTrue(s.MultipleRule(3)((3, 99, 30)))
+        self.assertFalse(s.MultipleRule(3)((3, 99, 31)))
+        self.assertTrue(s.ElementMinimumRule(1, 50)((1, 50, 1)))
+        self.assertTrue(s.SumMinimumRule(60)((20, 20, 20)))
+        self.assertFalse(s.SumMinimumRule(61)((20, 20, 20)))
+    def check_mask(self, rule):
+        mask = rule.mask()
+        self.assertEqual(mask.nbytes, s.SPACE_SIZE // 8)
+        bits = np.unpackbits(mask)
+        for i in range(0, s.SPACE_SIZE, 9973):
+            self.assertEqual(bool(bits[i]), rule(s.index_to_sequence(i)), str(rule))
+    def test_masks(self):
+        for rule in (s.AscendingRule(), s.ArithmeticRule(), s.ComparisonRule(1, 2), s.DistinctRule(),
+                s.MultipleRule(2), s.ElementMinimumRule(0, 30), s.SumMinimumRule(150),
+                s.XorRule(s.NegationRule(s.MultipleRule(5)),
+                    s.ConjunctionRule(s.AscendingRule(), s.SumMinimumRule(100)))):
+            self.check_mask(rule)
+    def test_random(self):
+        rng = random.Random(0)
+        for i in range(10):
+            rule = s.random_rule(rng.randint(1, 6), rng=rng)
+            self.assertTrue(rule.reasonable())
+            self.check_mask(rule)
+    def test_accept_fraction(self):
+        self.assertEqual(s.MultipleRule(2).accept_fraction(), 1 / 8)
+        self.assertEqual(s.ElementMinimumRule(0, 51).accept_fraction(), 1 / 2)
+
+class TestSampling(unittest.TestCase):
+    def test_sample_sequences(self):
+        rule = s.ConjunctionRule(s.AscendingRule(), s.MultipleRule(5))
+        sequences = s.sample_sequences(rule.mask(), 50, random.Random(0))
+        self.assertEqual(len(set(sequences)), 50)
+        self.assertTrue(all(map(rule, sequences)))
+    def test_distinguishing_sequences(self):
+        rule1, rule2 = s.SumMinimumRule(100), s.SumMinimumRule(101)
+        sequences = s.distinguishing_sequences(rule1, rule2, 10000, random.Random(0))
+        self.assertEqual(len(sequences), 4851) # number of ways 3 numbers from 1 to 100 sum to 100
+        self.assertTrue(all(sum(seq) == 100 for seq in sequences))
+
+class TestMaskCache(unittest.TestCase):
+    def test_eviction(self):
+        old_size = s.MASK_CACHE_SIZE
+        s.MASK_CACHE_SIZE = 2
+        try:
+            s.mask_cache.clear()
+            s.MultipleRule(2).mask()
+            s.MultipleRule(3).mask()
+            s.MultipleRule(2).mask() # now the most recently used
+            s.MultipleRule(5).mask()
+            self.assertEqual(list(s.mask_cache), [str(s.MultipleRule(2)), str(s.MultipleRule(5))])
+        finally:
+            s.MASK_CACHE_SIZE = old_size
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+
+# Measures the memory taken by a pool of randomly-generated rules, per pooled rule,
+# both as live rule trees (including their examples) and in the binary encoding.
+# At complexity 4 this gives about 2.4 KB per live rule, 2.2 KB of it examples, and
+# 6.5 bytes per encoded rule.
+# Usage: bench_memory.py [pool size] [complexity]
+
+import sys
+import tracemalloc
+
+import rules
+
+
+POOL_SIZE = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+COMPLEXITY = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+if __name__ == "__main__":
+    tracemalloc.start()
+    for i in range(POOL_SIZE):
+        # Fill caches (e.g. of compiled regexes) first, so they aren't counted. They must be
+        # filled while tracing, else entries they drop later would be untraced, and replacing
+        # them would count as growth.
+        rules.random_rule(COMPLEXITY)
+    before, _ = tracemalloc.get_traced_memory()
+    pool = [rules.random_rule(COMPLEXITY) for i in range(POOL_SIZE)]
+    after, _ = tracemalloc.get_traced_memory()
+    live_bytes = (after - before) / POOL_SIZE
+
+    before, _ = tracemalloc.get_traced_memory()
+    for rule in pool:
+        rule.discard_examples()
+    after, _ = tracemalloc.get_traced_memory()
+    example_bytes = (before - after) / POOL_SIZE
+    tracemalloc.stop()
+
+    encoded_bytes = sum(len(rules.rule_to_bytes(rule)) for rule in pool) / POOL_SIZE
+
+    print("Pool of %s rules of complexity %s:" % (POOL_SIZE, COMPLEXITY))
+    print("\tlive rule tree with examples:  %8.1f bytes per rule" % live_bytes)
+    print("\t  of which examples:           %8.1f bytes per rule" % example_bytes)
+    print("\tbinary encoding:               %8.1f bytes per rule" % encoded_bytes)
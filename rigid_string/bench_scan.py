@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+
+# Compares ways of finding every dictionary word a substring rule accepts: filtering the
+# words with the rule (as test_random_words does, one call per word), building the word
+# mask one call per word, and building it from one regex scan of the words file.
+# Usage: bench_scan.py [repetitions]
+
+import sys
+import time
+
+import rules
+
+
+REPETITIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+
+RULES = [rules.ContainmentRule("ab"), rules.ContainmentRule("ing"), rules.PrefixRule("s"),
+        rules.PrefixRule("qu"), rules.SuffixRule("s"), rules.SuffixRule("ed"),
+        rules.DisjunctionRule(rules.PrefixRule("un"), rules.SuffixRule("ness"))]
+
+def best_time(function):
+    """Returns the least time taken by `function`, in milliseconds, over REPETITIONS calls."""
+    times = []
+    for i in range(REPETITIONS):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+if __name__ == "__main__":
+    if rules.dictionary_blob() is None:
+        sys.exit("The words file can't be scanned.")
+    print("%-35s %8s %10s %10s %8s" % ("rule", "accepts", "filter", "predicate", "scan"))
+    for rule in RULES:
+        accepted = bin(rules.mask_from_pattern(rule.pattern())).count("1")
+        filter_time = best_time(lambda: list(filter(rule, rules.ALL_WORDS)))
+        predicate_time = best_time(lambda: rules.mask_from_predicate(rule))
+        scan_time = best_time(lambda: rules.mask_from_pattern(rule.pattern()))
+        print("%-35s %8d %8.1fms %8.1fms %6.1fms" % (rule, accepted, filter_time,
+            predicate_time, scan_time))
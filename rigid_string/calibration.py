@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+
+# Difficulty calibration. Generates large batches of rules at each complexity, measures
+# each one over the whole dictionary, and fits a mapping from those measurements to
+# difficulty. The rules are then cached in bands by fitted difficulty, so that the game
+# can quickly get a rule of the requested difficulty instead of sampling blindly.
+#
+# Once enough games have been logged, difficulty is fitted to how hard players actually
+# found their rules (see empirical_difficulty), and rules are ordered into the bands by
+# that; each band keeps as many rules as were generated at its complexity, so the
+# spread of difficulties is unchanged. Until then, difficulty is fitted to the
+# complexity the rules were generated at.
+#
+# Run this standalone to (re)build the cache:  calibration.py [rules per complexity] [seed]
+
+from collections import namedtuple
+from multiprocessing import Pool
+from os import path
+from random import Random
+import random
+import math
+import pickle
+import sys
+
+import rules
+sys.path.append(path.join(path.dirname(path.realpath(__file__)), "..", "shared"))
+import gamelog
+
+
+# Configuration
+########################################################################
+
+RULES_PER_COMPLEXITY = 100 # number of rules to generate at each complexity when calibrating
+
+COMPLEXITIES = range(1, 13) # complexities to generate rules at; these are also the difficulty bands
+
+CACHE_PATH = path.join(path.dirname(path.realpath(__file__)), "..", "calibration.pickle")
+
+CACHE_VERSION = 2 # bump this whenever rule encodings or measurements change
+
+GAMELOG_PATH = path.join(path.dirname(path.realpath(__file__)), "..", "games.log")
+    # the game log zendo.py writes to, whose games calibration learns from
+
+MIN_LOGGED_GAMES = 30 # logged games needed before difficulty is fitted to them
+
+FAILED_GAME_QUERIES = 10
+    # A lost or abandoned game counts as needing this many more queries than were made.
+
+
+# Measuring rules
+########################################################################
+
+RuleStats = namedtuple("RuleStats", ["accept_rate", "distinguishing_queries", "tree_size"])
+RuleStats.__doc__ = """Measured properties of a rule.
+`accept_rate` is the fraction of the whole dictionary it accepts.
+`distinguishing_queries` is the expected number of random dictionary words needed to
+tell it apart from its hardest-to-distinguish neighbour (see Rule.neighbours).
+`tree_size` is the number of nodes in its rule tree."""
+
+def tree_size(rule):
+    return 1 + sum(tree_size(subrule) for subrule in rule.subrules())
+
+def measure(rule):
+    """Returns the RuleStats of `rule`."""
+    num_words = len(rules.ALL_WORDS)
+    mask = rule.word_mask()
+    distinguishing_queries = 1.
+    for neighbour in rule.neighbours():
+        num_differing = bin(mask ^ neighbour.word_mask()).count("1")
+        if num_differing: # else the neighbour is equivalent, so needn't be distinguished
+            distinguishing_queries = max(distinguishing_queries, num_words / num_differing)
+    return RuleStats(bin(mask).count("1") / num_words, distinguishing_queries, tree_size(rule))
+
+def features(stats):
+    """Regressors used to predict difficulty from RuleStats."""
+    p = stats.accept_rate
+    entropy = -(p * math.log2(p) + (1 - p) * math.log2(1 - p)) if 0 < p < 1 else 0.
+    return (1., stats.tree_size, math.log2(stats.distinguishing_queries), entropy)
+
+
+# Fitting
+########################################################################
+
+def fit_difficulty(samples):
+    """Least-squares fit of difficulty against features(stats), given a list of
+    (stats, difficulty) pairs. Returns the coefficients."""
+    xs = [features(stats) for stats, difficulty in samples]
+    k = len(xs[0])
+    # Solve the normal equations by Gaussian elimination with partial pivoting.
+    # The tiny ridge term keeps this solvable if some feature happens to be constant.
+    a = [[sum(x[i] * x[j] for x in xs) + (1e-9 if i == j else 0.) for j in range(k)]
+            + [sum(x[i] * difficulty for x, (stats, difficulty) in zip(xs, samples))]
+            for i in range(k)]
+    for col in range(k):
+        pivot = max(range(col, k), key=lambda row: abs(a[row][col]))
+        a[col], a[pivot] = a[pivot], a[col]
+        for row in range(col + 1, k):
+            factor = a[row][col] / a[col][col]
+            for j in range(col, k + 1):
+                a[row][j] -= factor * a[col][j]
+    coefficients = [0.] * k
+    for row in reversed(range(k)):
+        coefficients[row] = (a[row][k] - sum(a[row][j] * coefficients[j]
+            for j in range(row + 1, k))) / a[row][row]
+    return coefficients
+
+def empirical_difficulty(record):
+    """How hard the player of a logged game found its rule: the number of words they
+    tested, plus FAILED_GAME_QUERIES unless they won."""
+    return len(record.queries) + (0 if record.outcome == "won" else FAILED_GAME_QUERIES)
+
+def logged_samples(log_path=GAMELOG_PATH):
+    """Returns (stats, empirical difficulty) pairs for the logged Rigid String Zendo
+    games whose rules were recorded."""
+    if not path.exists(log_path):
+        return []
+    stats_by_rule = {}
+    samples = []
+    with gamelog.GameLog(log_path) as log:
+        for record in log.records(game="rigid"):
+            if record.encoded_rule is None:
+                continue
+            stats = stats_by_rule.get(record.encoded_rule)
+            if stats is None:
+                try:
+                    rule = rules.rule_from_bytes(record.encoded_rule)
+                except (ValueError, IndexError): # e.g. logged before rule encodings changed
+                    continue
+                stats = stats_by_rule[record.encoded_rule] = measure(rule)
+            samples.append((stats, empirical_difficulty(record)))
+    return samples
+
+def predict_difficulty(coefficients, stats):
+    return sum(c * x for c, x in zip(coefficients, features(stats)))
+
+def difficulty_band(coefficients, stats):
+    """Returns the difficulty band (one of COMPLEXITIES) a rule with `stats` falls in."""
+    band = int(round(predict_difficulty(coefficients, stats)))
+    return min(max(band, COMPLEXITIES[0]), COMPLEXITIES[-1])
+
+
+# Calibrating
+########################################################################
+
+def _generate(job):
+    """Generates and measures one rule, given its complexity and the seed of its own
+    random stream. Returns its encoding, complexity and stats, or None if no rule
+    could be generated."""
+    complexity, seed = job
+    try:
+        rule = rules.random_rule(complexity, rng=Random(seed))
+    except rules.IncorrectComplexity:
+        return None
+    return rules.rule_to_bytes(rule), complexity, measure(rule)
+
+def calibrate(rules_per_complexity=RULES_PER_COMPLEXITY, processes=None, seed=None,
+        log_path=GAMELOG_PATH):
+    """Generates `rules_per_complexity` rules at each complexity in parallel, fits the
+    difficulty mapping (to the games logged at `log_path`, if there are enough), and
+    returns a cache dict with the coefficients and the rules' encodings banded by
+    difficulty.
+    Each rule gets its own random stream, seeded from `seed`, so the result is the
+    same for a given seed and log however the work is split between processes."""
+    seeds = Random(seed)
+    jobs = [(complexity, seeds.getrandbits(64))
+            for complexity in COMPLEXITIES for i in range(rules_per_complexity)]
+    with Pool(processes) as pool:
+        results = [result for result in pool.imap(_generate, jobs, chunksize=4)
+                if result is not None]
+    samples = logged_samples(log_path)
+    bands = {band: [] for band in COMPLEXITIES}
+    if len(samples) >= MIN_LOGGED_GAMES:
+        coefficients = fit_difficulty(samples)
+        fitted_to = "games"
+        band_sizes = [sum(1 for data, complexity, stats in results if complexity == band)
+                for band in COMPLEXITIES]
+        ordered = sorted(results, key=lambda result: predict_difficulty(coefficients, result[2]))
+        position = 0
+        for band, band_size in zip(COMPLEXITIES, band_sizes):
+            bands[band] = [data for data, complexity, stats in ordered[position : position + band_size]]
+            position += band_size
+    else:
+        coefficients = fit_difficulty([(stats, complexity) for data, complexity, stats in results])
+        fitted_to = "complexity"
+        for data, complexity, stats in results:
+            bands[difficulty_band(coefficients, stats)].append(data)
+    return {"version": CACHE_VERSION, "words": words_key(), "coefficients": coefficients,
+            "fitted_to": fitted_to, "num_games": len(samples), "bands": bands}
+
+def words_key():
+    """Identifies the dictionary file, so caches built from another one are ignored."""
+    return (path.getsize(rules.WORDS_PATH), len(rules.ALL_WORDS))
+
+
+# Using the cache
+########################################################################
+
+_cache = None
+
+def save_cache(cache, cache_path=CACHE_PATH):
+    global _cache
+    with open(cache_path, "wb") as cache_file:
+        pickle.dump(cache, cache_file, pickle.HIGHEST_PROTOCOL)
+    _cache = cache
+
+def load_cache(cache_path=CACHE_PATH):
+    """Returns the calibration cache, or None if there's no usable one."""
+    global _cache
+    if _cache is None:
+        try:
+            with open(cache_path, "rb") as cache_file:
+                cache = pickle.load(cache_file)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if cache.get("version") != CACHE_VERSION or cache.get("words") != words_key():
+            return None
+        _cache = cache
+    return _cache
+
+def rule_for_difficulty(difficulty, rng=random):
+    """Returns a random reasonable rule from the given difficulty band, with its
+    examples, or None if the calibration cache has no rules in that band."""
+    cache = load_cache()
+    if cache is None or not cache["bands"].get(difficulty):
+        return None
+    for i in range(rules.NUM_TRIES):
+        rule = rules.rule_from_bytes(rng.choice(cache["bands"][difficulty]))
+        if rule.reasonable(rng):
+            return rule
+    return None
+
+
+if __name__ == "__main__":
+    rules_per_complexity = int(sys.argv[1]) if len(sys.argv) > 1 else RULES_PER_COMPLEXITY
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    print("Generating and measuring %s rules at each of complexities %s to %s..." %
+            (rules_per_complexity, COMPLEXITIES[0], COMPLEXITIES[-1]))
+    cache = calibrate(rules_per_complexity, seed=seed)
+    save_cache(cache)
+    if cache["fitted_to"] == "games":
+        print("Fitted to %s logged games: queries needed = " % cache["num_games"], end="")
+    else:
+        print("Only %s logged games with recorded rules (%s needed), so fitted to complexity:"
+                " difficulty = " % (cache["num_games"], MIN_LOGGED_GAMES), end="")
+    print("%.3f + %.3f * tree size + %.3f * log2(distinguishing queries)"
+            " + %.3f * accept entropy" % tuple(cache["coefficients"]))
+    for band, band_rules in cache["bands"].items():
+        print("\tdifficulty %2s: %5s rules" % (band, len(band_rules)))
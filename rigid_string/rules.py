@@ -1,9 +1,21 @@
 #!/usr/bin/env python3
 
-from random import choice, randint, shuffle, random
+import random
+from array import array
+from collections import OrderedDict
+from functools import lru_cache
 import string
 import math
+import mmap
+import os
+import re
 from os import path
+import sys
+
+sys.path.append(path.join(path.dirname(path.realpath(__file__)), "..", "shared"))
+import wordsource
+import sampling
+import profiling
 
 
 # Configuration
@@ -13,8 +25,14 @@ REASONABILITY_SAMPLE_SIZE = 1000 # number of words to test when determining whet
 REASONABILITY_MIN_ACCEPT = 10 # minimum number of words a rule must accept to be "reasonable", out of sample
 REASONABILITY_MIN_REJECT = 10 # minimum number of words a rule must reject to be "reasonable", out of sample
 
+MASK_CACHE_BYTES = 64 * 1024 * 1024 # memory to spend caching leaf rules' word masks
+
 NUM_TRIES = 100 # number of times to try generating various rules randomly before giving up
 
+# Every function here that needs randomness takes an `rng` argument, which should be a
+# random.Random instance. It defaults to the random module itself, i.e. the global stream.
+# Given a random.Random(seed), rule generation is reproducible.
+
 STRINGS_GENERALLY_LONGER_THAN = 4
 STRINGS_GENERALLY_SHORTER_THAN = 10
 
@@ -24,14 +42,29 @@ STRINGS_GENERALLY_SHORTER_THAN = 10
 
 # Requires file 'words.txt', each of whose lines should be exactly one word consisting of only lowercase letters.
 # (Creatable by taking a standard dictionary and doing: :%v/^[a-z]*/d )
-WORDS_PATH = path.join(path.dirname(path.realpath(__file__)), "..", "words.txt")
-ALL_WORDS = open(WORDS_PATH, "r").read().splitlines()
+# Another dictionary can be used by setting the environment variable ZENDO_WORDS to its path;
+# big ones are streamed from disk rather than loaded (see shared/wordsource.py).
+WORDS_PATH = os.environ.get("ZENDO_WORDS",
+        path.join(path.dirname(path.realpath(__file__)), "..", "words.txt"))
+ALL_WORDS = wordsource.open_words(WORDS_PATH)
+
+INDEX_TYPECODE = "H" if len(ALL_WORDS) <= 0xFFFF else "I"
+    # array typecode for storing indices into ALL_WORDS; 2 bytes per example when the dictionary allows
+
+ALL_WORDS_MASK = (1 << len(ALL_WORDS)) - 1
+    # word masks are ints whose bit i says whether a rule accepts ALL_WORDS[i]
+
+mask_cache = OrderedDict() # least-recently-used cache of leaf rules' word masks, by binary encoding
+MASK_CACHE_SIZE = max(1, MASK_CACHE_BYTES // (len(ALL_WORDS) // 8 + 1)) # number of masks that fit
 
 concrete_rules = []
 def register_concrete_rule(cls):
     """Decorator to register a concrete subclass of Rule.
-    This is used when generating random rules."""
+    This is used when generating random rules.
+    The class's position in `concrete_rules` is also its tag in the binary
+    encoding, so new rules should only ever be registered after old ones."""
     global concrete_rules
+    cls.tag = len(concrete_rules)
     concrete_rules.append(cls)
     return cls
 
@@ -50,51 +83,295 @@ class StructureError(Exception):
     just have "X")."""
     pass
 
-def test_random_words(rule, num_words):
-    words_copy = ALL_WORDS[:]
-    shuffle(words_copy)
-    word_sample = words_copy[:num_words]
-    examples_accepted = list(filter(rule, word_sample))
-    examples_rejected = list(filter(lambda w: w not in examples_accepted,
-        word_sample))
+def test_random_indices(rule, num_words, rng=random):
+    """Tests `num_words` random words with the given `rule`, and returns the
+    indices (into ALL_WORDS) of those accepted and rejected, as two arrays.
+    The words are looked up in the rule's word mask when that's cheap (see
+    Rule.cheap_word_mask), else the rule is called on each of them; the result is
+    the same either way."""
+    examples_accepted = array(INDEX_TYPECODE)
+    examples_rejected = array(INDEX_TYPECODE)
+    indices = rng.sample(range(len(ALL_WORDS)), num_words) # as ALL_WORDS.sample_indexed() does
+    if rule.cheap_word_mask():
+        bits = rule.word_mask().to_bytes(len(ALL_WORDS) // 8 + 1, "little")
+        accepted = [bits[i >> 3] >> (i & 7) & 1 for i in indices]
+    else:
+        accepted = map(rule, ALL_WORDS.words_at(indices))
+    for i, accepts in zip(indices, accepted):
+        if accepts:
+            examples_accepted.append(i)
+        else:
+            examples_rejected.append(i)
     return examples_accepted, examples_rejected
 
+def mask_from_predicate(predicate):
+    """Returns the word mask of the words in ALL_WORDS satisfying `predicate`.
+    The dictionary is processed one chunk at a time."""
+    mask = 0
+    for start, words in ALL_WORDS.chunks():
+        chunk_mask = int("".join("1" if predicate(word) else "0" for word in reversed(words)) or "0", 2)
+        mask |= chunk_mask << start
+    return mask
+
+def mask_from_indices(indices):
+    """Returns the word mask with exactly the bits at `indices` set."""
+    bits = bytearray(len(ALL_WORDS) // 8 + 1)
+    for i in indices:
+        bits[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(bits, "little")
+
+# Rules whose pattern() isn't None can instead be evaluated over the whole dictionary by
+# one regex search through the raw bytes of the words file, which only takes a Python
+# step per match, rather than a call per word. The file is memory-mapped, so this works
+# the same for dictionaries too big to load.
+
+_dictionary_blob = None
+
+def dictionary_blob():
+    """Returns a memory map of the words file, or None if the file can't be scanned
+    for words (because it's empty, or has line breaks other than "\n", which would
+    split it into words differently than ALL_WORDS does)."""
+    global _dictionary_blob
+    if _dictionary_blob is None:
+        _dictionary_blob = False
+        with open(WORDS_PATH, "rb") as words_file:
+            if path.getsize(WORDS_PATH) > 0:
+                blob = mmap.mmap(words_file.fileno(), 0, access=mmap.ACCESS_READ)
+                if re.search(rb"[\r\v\f\x1c-\x1e]|\xc2\x85|\xe2\x80[\xa8\xa9]", blob) is None:
+                    _dictionary_blob = blob
+    return _dictionary_blob or None
+
+def scan_indices(pattern):
+    """Yields, in order, the indices of the words in which regex `pattern` (bytes)
+    matches, searching the words file in one pass. A match must not span lines."""
+    blob = dictionary_blob()
+    index = 0 # of the word containing the current position
+    position = 0
+    last_index = -1
+    for match in re.finditer(pattern, blob):
+        start = match.start()
+        index += blob[position:start].count(b"\n")
+        position = start
+        if index != last_index:
+            yield index
+            last_index = index
+
+def mask_from_pattern(pattern):
+    """Returns the word mask of the words in which regex `pattern` matches."""
+    return mask_from_indices(scan_indices(pattern))
+
+class DictionaryIndex(object):
+    """Word masks of simple properties of the dictionary's words, from which the
+    word masks of some rules can be computed with a few bitwise operations,
+    rather than calling the rule on every word.
+    Built in one pass over the dictionary, setting bits of bytearrays as it goes, so
+    it takes little more memory than the masks themselves; use dictionary_index() to
+    get it."""
+    def __init__(self):
+        num_bytes = len(ALL_WORDS) // 8 + 1
+        position_bits = {} # (position, letter) -> bits of words with that letter there
+        length_bits = {} # length -> bits of words with that length
+        run_bits = {} # n -> bits of words whose longest run of one letter has length n
+        alternating_bits = bytearray(num_bytes) # bits of words alternating vowels and consonants
+        for start, words in ALL_WORDS.chunks():
+            for i, word in enumerate(words, start):
+                byte, bit = i >> 3, 1 << (i & 7)
+                longest_run = run = 0
+                alternating = True
+                previous = None
+                for position, letter in enumerate(word):
+                    bits = position_bits.get((position, letter))
+                    if bits is None:
+                        bits = position_bits[(position, letter)] = bytearray(num_bytes)
+                    bits[byte] |= bit
+                    run = run + 1 if letter == previous else 1
+                    longest_run = max(longest_run, run)
+                    if previous is not None and (letter in VOWELS) == (previous in VOWELS):
+                        alternating = False
+                    previous = letter
+                bits = length_bits.get(len(word))
+                if bits is None:
+                    bits = length_bits[len(word)] = bytearray(num_bytes)
+                bits[byte] |= bit
+                bits = run_bits.get(longest_run)
+                if bits is None:
+                    bits = run_bits[longest_run] = bytearray(num_bytes)
+                bits[byte] |= bit
+                if alternating:
+                    alternating_bits[byte] |= bit
+        self.max_length = max(length_bits, default=0)
+
+        self.position_masks = [{} for position in range(self.max_length)]
+            # position_masks[p][c] is the mask of words whose letter at position p is c
+        for (position, letter) in list(position_bits):
+            self.position_masks[position][letter] = int.from_bytes(
+                    position_bits.pop((position, letter)), "little")
+        self.length_masks = [int.from_bytes(length_bits.get(length, b""), "little")
+                for length in range(self.max_length + 1)]
+        self.min_length_masks = self._cumulative_masks(self.length_masks)
+            # min_length_masks[n] is the mask of words of length at least n
+        self.min_run_masks = self._cumulative_masks([int.from_bytes(run_bits.get(run, b""), "little")
+                for run in range(max(run_bits, default=0) + 1)])
+            # min_run_masks[n] is the mask of words with some letter repeated at least n times in a row
+        self.alternating_mask = int.from_bytes(alternating_bits, "little")
+
+    def _cumulative_masks(self, masks_by_value):
+        """Returns a list whose nth element is the mask of words whose value is at
+        least n, given the list of masks of the words with each value."""
+        masks = [0] * (len(masks_by_value) + 1)
+        for value in reversed(range(len(masks_by_value))):
+            masks[value] = masks[value + 1] | masks_by_value[value]
+        return masks
+
+    def min_length_mask(self, length):
+        return self.min_length_masks[length] if length < len(self.min_length_masks) else 0
+
+    def letter_mask(self, position, letter):
+        """Mask of words with `letter` at `position`."""
+        return self.position_masks[position].get(letter, 0) if position < self.max_length else 0
+
+_dictionary_index = None
+
+def dictionary_index():
+    """Returns the DictionaryIndex of ALL_WORDS, building it the first time, or None
+    if the dictionary is streamed: the index holds dozens of masks of the whole
+    dictionary, which for a dictionary too big to load would be too big to keep."""
+    global _dictionary_index
+    if _dictionary_index is None:
+        if isinstance(ALL_WORDS, wordsource.StreamingWords):
+            return None
+        _dictionary_index = DictionaryIndex()
+    return _dictionary_index
+
+def test_random_words(rule, num_words, rng=random):
+    """Like test_random_indices, but returns lists of the words themselves."""
+    accepted_indices, rejected_indices = test_random_indices(rule, num_words, rng)
+    return ALL_WORDS.words_at(accepted_indices), ALL_WORDS.words_at(rejected_indices)
+
 class Rule(object):
     """Abstract base class for rules that determine whether strings
     are legal or illegal.
     This is an example of what has been called the "specification
     pattern".
+    Every subclass must declare __slots__ (even if empty), so that rule
+    nodes don't each carry a __dict__; we keep thousands of them around.
     """
+    __slots__ = ("accepted_indices", "rejected_indices")
+        # indices into ALL_WORDS of the examples found by reasonable()
     probability_weight = .5 # this determines how often random_rule()
         # chooses this rule. It's normalized to a categorical
         # distribution over concrete rule classes.
+    indexed_mask = False # whether word_mask() is computed from the DictionaryIndex
     def __call__(self, s):
         """This should return whether or not the given string
         is legal according to this Rule."""
         raise NotImplementedError("abstract base class")
     @classmethod
-    def get_random(cls, complexity):
+    def get_random(cls, complexity, rng=random):
         """Creates and returns a random instance of this class.
         Resulting rule should have complexity commensurate with
         `complexity`.
         You should implement this in any """
         raise NotImplementedError()
-    def reasonable(self):
+    def reasonable(self, rng=random):
         """Returns whether this rule is "reasonable", meaning that
         it's suitable for use in the game. This requires that e.g.
         it doesn't accept all strings, nor does it reject all
         strings."""
-        self.examples_accepted, self.examples_rejected = test_random_words(self, REASONABILITY_SAMPLE_SIZE)
-            # (we store these as properties because we'll need them later if we use this rule)
-        num_accepted = len(self.examples_accepted)
-        num_rejected = len(self.examples_rejected)
-        if len(self.examples_accepted) < REASONABILITY_MIN_ACCEPT:
+        with profiling.phase("reasonable"):
+            self.accepted_indices, self.rejected_indices = test_random_indices(self, REASONABILITY_SAMPLE_SIZE, rng)
+            # (we store these because we'll need them later if we use this rule)
+        if len(self.accepted_indices) < REASONABILITY_MIN_ACCEPT:
             return False
-        if len(self.examples_rejected) < REASONABILITY_MIN_REJECT:
+        if len(self.rejected_indices) < REASONABILITY_MIN_REJECT:
             return False
         return True
+    @property
+    def examples_accepted(self):
+        """List of words found to be accepted by reasonable()."""
+        return ALL_WORDS.words_at(self.accepted_indices)
+    @property
+    def examples_rejected(self):
+        """List of words found to be rejected by reasonable()."""
+        return ALL_WORDS.words_at(self.rejected_indices)
+    def word_mask(self):
+        """Returns the word mask of this rule, i.e. an int whose bit i is set
+        iff this rule accepts ALL_WORDS[i]. Leaf rules' masks are cached."""
+        key = rule_to_bytes(self)
+        mask = mask_cache.get(key)
+        if mask is None:
+            pattern = self.pattern()
+            if pattern is not None and dictionary_blob() is not None:
+                mask = mask_from_pattern(pattern)
+            else:
+                mask = mask_from_predicate(self)
+            mask_cache[key] = mask
+            if len(mask_cache) > MASK_CACHE_SIZE:
+                mask_cache.popitem(last=False)
+        else:
+            mask_cache.move_to_end(key)
+        return mask
+    def cheap_word_mask(self):
+        """Returns whether word_mask() would be about as quick as calling this rule
+        on the REASONABILITY_SAMPLE_SIZE words reasonable() tests, because the masks it's built
+        from are cached, or come from an already built DictionaryIndex. Leaf rules'
+        masks otherwise take a pass over the whole dictionary."""
+        if self.indexed_mask and _dictionary_index is not None:
+            return True
+        return rule_to_bytes(self) in mask_cache
+    def subrules(self):
+        """Returns the rules this rule is built from."""
+        return ()
+    def pattern(self):
+        """Returns a regex (bytes) matching somewhere in exactly the words (without
+        line breaks) this rule accepts, not spanning lines, if this rule is worth
+        evaluating by scan_indices(); else None."""
+        return None
+    def neighbours(self):
+        """Returns a list of rules that differ from this one by one small change,
+        e.g. a limit moved by one, or one side of a combination dropped."""
+        return []
+    def discard_examples(self):
+        """Frees the examples stored by reasonable(). Only the top-level rule's
+        examples are ever used, so subrules drop theirs once combined."""
+        for attr in Rule.__slots__:
+            if hasattr(self, attr):
+                delattr(self, attr)
+    def pack(self, out):
+        """Appends the binary encoding of this rule to bytearray `out`:
+        the class's tag byte followed by its parameters."""
+        out.append(self.tag)
+        self.pack_params(out)
+    def pack_params(self, out):
+        """Appends the binary encoding of this rule's parameters to `out`."""
+        raise NotImplementedError("abstract base class")
+    @classmethod
+    def unpack_params(cls, data, pos):
+        """Decodes an instance of this class from the parameters starting at
+        `data[pos]`. Returns the instance and the position after its encoding."""
+        raise NotImplementedError("abstract base class")
+
+def unpack_rule(data, pos=0):
+    """Decodes the rule whose encoding starts at `data[pos]`. Returns the rule
+    and the position after its encoding."""
+    return concrete_rules[data[pos]].unpack_params(data, pos + 1)
+
+def rule_to_bytes(rule):
+    """Returns a compact binary encoding of `rule` (but not its examples)."""
+    out = bytearray()
+    rule.pack(out)
+    return bytes(out)
+
+def rule_from_bytes(data):
+    """Inverse of rule_to_bytes()."""
+    rule, pos = unpack_rule(data)
+    if pos != len(data):
+        raise ValueError("trailing bytes after encoded rule")
+    return rule
+
+rule_classes = sampling.ClassSampler(concrete_rules) # concrete rules, by probability_weight
 
-def random_rule(complexity, forbidden_classes=None, top_level=False):
+def random_rule(complexity, forbidden_classes=None, top_level=False, rng=random):
     """Generates a random rule, which behaves reasonably, e.g.
     doesn't accept or reject an overwhelming majority of words."""
     #print("random_rule complexity ", complexity)
@@ -102,25 +379,14 @@ def random_rule(complexity, forbidden_classes=None, top_level=False):
         raise IncorrectComplexity()
     if forbidden_classes is None:
         forbidden_classes = []
-    legal_concrete_rules = [rule for rule in concrete_rules if rule not in forbidden_classes]
-    def get_rule():
-        normalizing_const = sum(rule.probability_weight for rule in concrete_rules\
-                if rule not in forbidden_classes)
-        x = random() * normalizing_const
-        shuffle(legal_concrete_rules)
-        for rule in legal_concrete_rules:
-            if x <= rule.probability_weight:
-                #print(rule)
-                return rule
-            x -= rule.probability_weight
-        raise Exception("categorical distribution sampling failed somehow")
+    sampler = rule_classes.excluding(forbidden_classes)
     try_limit = (1000 if top_level else 100)
     for try_num in range(1, try_limit):
-        concrete_rule = get_rule()
+        concrete_rule = sampler.sample(rng)
         try:
             #print(concrete_rule)
-            ret_rule = concrete_rule.get_random(complexity)
-            if ret_rule.reasonable():
+            ret_rule = concrete_rule.get_random(complexity, rng)
+            if ret_rule.reasonable(rng):
                 return ret_rule
         except (IncorrectComplexity, StructureError):
             pass # try next rule
@@ -134,6 +400,7 @@ def random_rule(complexity, forbidden_classes=None, top_level=False):
 class CombinationRule(Rule):
     """Abstract base class for rules which work by combining two
     simpler rules."""
+    __slots__ = ("test1", "test2")
     name = "(CombinationRule name)"
     combining_complexity = 1 # Complexity of the combination rule itself, added to combinands' complexities
     def combin_func(self, x, y):
@@ -145,12 +412,33 @@ class CombinationRule(Rule):
         return self.combin_func(self.test1(s), self.test2(s))
     def __str__(self):
         return "(%s) %s (%s)" % (str(self.test1), self.name, str(self.test2))
+    def combin_mask(self, x, y):
+        """combin_func, applied bitwise to word masks."""
+        raise NotImplementedError()
+    def word_mask(self):
+        return self.combin_mask(self.test1.word_mask(), self.test2.word_mask())
+    def cheap_word_mask(self):
+        return self.test1.cheap_word_mask() and self.test2.cheap_word_mask()
+    def subrules(self):
+        return (self.test1, self.test2)
+    def neighbours(self):
+        return ([self.test1, self.test2]
+                + [type(self)(n, self.test2) for n in self.test1.neighbours()]
+                + [type(self)(self.test1, n) for n in self.test2.neighbours()])
+    def pack_params(self, out):
+        self.test1.pack(out)
+        self.test2.pack(out)
+    @classmethod
+    def unpack_params(cls, data, pos):
+        test1, pos = unpack_rule(data, pos)
+        test2, pos = unpack_rule(data, pos)
+        return cls(test1, test2), pos
     @classmethod
-    def get_random(cls, complexity):
+    def get_random(cls, complexity, rng=random):
         if complexity < (1 + 1 + cls.combining_complexity):
             raise IncorrectComplexity()
         # combining takes 1 complexity, then the rest is passed to subrules
-        left_complexity = randint(1, complexity - 1 - cls.combining_complexity)
+        left_complexity = rng.randint(1, complexity - 1 - cls.combining_complexity)
         right_complexity = complexity - cls.combining_complexity - left_complexity
         # We know it's possible to generate a valid rule with these complexities,
         # so keep trying until we do. Else it'll fail and disproportionately
@@ -158,8 +446,11 @@ class CombinationRule(Rule):
         # that never fails.
         for i in range(NUM_TRIES):
             try:
-                left_part = random_rule(left_complexity)
-                right_part = random_rule(right_complexity, cls.forbidden_classes().get(left_part.__class__, []))
+                left_part = random_rule(left_complexity, rng=rng)
+                right_part = random_rule(right_complexity, cls.forbidden_classes().get(left_part.__class__, []),
+                        rng=rng)
+                left_part.discard_examples()
+                right_part.discard_examples()
                 return cls(left_part, right_part)
             except (IncorrectComplexity, StructureError):
                 continue
@@ -173,38 +464,64 @@ class CombinationRule(Rule):
                     # Because (length >= 2) AND (length >= 3) is equivalent to just length >=3
                 VowelCount: [VowelCount],
                 ConsonantCount: [ConsonantCount],
-                UniqueCount: [UniqueCount]
+                UniqueCount: [UniqueCount],
+                RepetitionCount: [RepetitionCount],
+                AlternationRule: [AlternationRule],
+                LengthMultipleRule: [LengthMultipleRule]
                 }
 
 @register_concrete_rule
 class ConjunctionRule(CombinationRule):
+    __slots__ = ()
     name = "and"
     probability_weight = .2
     combining_complexity = 1
     def combin_func(self, x, y):
         return x and y
+    def combin_mask(self, x, y):
+        return x & y
 
 @register_concrete_rule
 class DisjunctionRule(CombinationRule):
+    __slots__ = ()
     name = "or"
     probability_weight = .2
     combining_complexity = 1
     def combin_func(self, x, y):
         return x or y
+    def combin_mask(self, x, y):
+        return x | y
+    def pattern(self):
+        pattern1, pattern2 = self.test1.pattern(), self.test2.pattern()
+        if pattern1 is None or pattern2 is None:
+            return None
+        return pattern1 + b"|" + pattern2
+    def word_mask(self):
+        # a disjunction of scannable rules takes one scan, rather than one per side
+        pattern = self.pattern()
+        if pattern is not None and dictionary_blob() is not None:
+            return mask_from_pattern(pattern)
+        return CombinationRule.word_mask(self)
+    def cheap_word_mask(self):
+        return self.pattern() is None and CombinationRule.cheap_word_mask(self)
 
 @register_concrete_rule
 class XorRule(CombinationRule):
+    __slots__ = ()
     name = "xor"
     probability_weight = .1
     combining_complexity = 2
     def combin_func(self, x, y):
         return (x or y) and not (x and y)
+    def combin_mask(self, x, y):
+        return x ^ y
     def forbidden_classes():
         return {}
 
 @register_concrete_rule
 class NegationRule(Rule):
     """Rule that negates some other rule."""
+    __slots__ = ("test",)
     probability_weight = .4
     complexity_cost = 0 # no complexity cost
     def __init__(self, test):
@@ -213,49 +530,80 @@ class NegationRule(Rule):
         return not self.test(s)
     def __str__(self):
         return "not (%s)" % str(self.test)
+    def word_mask(self):
+        return ALL_WORDS_MASK ^ self.test.word_mask()
+    def cheap_word_mask(self):
+        return self.test.cheap_word_mask()
+    def subrules(self):
+        return (self.test,)
+    def neighbours(self):
+        return [type(self)(n) for n in self.test.neighbours()]
+    def pack_params(self, out):
+        self.test.pack(out)
     @classmethod
-    def get_random(cls, complexity):
+    def unpack_params(cls, data, pos):
+        test, pos = unpack_rule(data, pos)
+        return cls(test), pos
+    @classmethod
+    def get_random(cls, complexity, rng=random):
         # a NegationRule takes zero complexity.
         forbidden_classes = [NegationRule, LengthMinimumRule, ConjunctionRule, DisjunctionRule,
                 XorRule]
             # Disallow CombinationRules - e.g. we rather represent not(A and B) as (not A) or (not B)
         for i in range(NUM_TRIES):
             try:
-                subrule = random_rule(complexity - cls.complexity_cost, forbidden_classes)
+                subrule = random_rule(complexity - cls.complexity_cost, forbidden_classes, rng=rng)
+                subrule.discard_examples()
                 return cls(subrule)
             except (IncorrectComplexity, StructureError):
                 pass
         raise IncorrectComplexity()
 
-def random_str(length):
+def random_str(length, rng=random):
     """Generates a random *lowercase* string of length `length`."""
     result = ""
     for i in range(length):
-        result += choice(string.ascii_lowercase)
+        result += rng.choice(string.ascii_lowercase)
     return result
 
 @register_concrete_rule
 class LengthMinimumRule(Rule):
+    __slots__ = ("limit",)
     probability_weight = .3
+    indexed_mask = True
     def __init__(self, limit):
         self.limit = limit
     def __call__(self, s):
         return len(s) >= self.limit
     def __str__(self):
         return "length at least %r" % self.limit
+    def word_mask(self):
+        index = dictionary_index()
+        if index is None:
+            return super().word_mask()
+        return index.min_length_mask(self.limit)
+    def neighbours(self):
+        return [type(self)(limit) for limit in (self.limit - 1, self.limit + 1) if limit >= 1]
+    def pack_params(self, out):
+        out.append(self.limit)
+    @classmethod
+    def unpack_params(cls, data, pos):
+        return cls(data[pos]), pos + 1
     @classmethod
-    def get_random(cls, complexity):
+    def get_random(cls, complexity, rng=random):
         if not (1 <= complexity <= 2):
             raise IncorrectComplexity()
-        return cls(randint(STRINGS_GENERALLY_LONGER_THAN, STRINGS_GENERALLY_SHORTER_THAN))
+        return cls(rng.randint(STRINGS_GENERALLY_LONGER_THAN, STRINGS_GENERALLY_SHORTER_THAN))
 # note that a NegationRule with a LengthMinimumRule is effectively a LengthMaximumRule, so no need
 # to implement that
 
 class SubstringRule(Rule):
     """Abstract base for rules which involve some operation
     with a substring."""
+    __slots__ = ("substr",)
     probability_weight = .4
     complexity_cost = 0 # Complexity cost is this plus substring length
+    length_min = 1 # Minimum permissible length of the substring
     length_max = 3 # Maximum permissible length of the substring
     def __init__(self, substr): 
         self.substr = substr
@@ -263,50 +611,74 @@ class SubstringRule(Rule):
         raise NotImplementedError("abstract base class")
     def __str__(self):
         raise NotImplementedError("abstract base class")
+    def neighbours(self):
+        if len(self.substr) == 1:
+            return []
+        return [type(self)(self.substr[1:]), type(self)(self.substr[:-1])]
+    def pack_params(self, out):
+        encoded = self.substr.encode("ascii")
+        out.append(len(encoded))
+        out += encoded
     @classmethod
-    def get_random(cls, complexity):
-        if complexity < 1 + cls.complexity_cost:
+    def unpack_params(cls, data, pos):
+        end = pos + 1 + data[pos]
+        return cls(bytes(data[pos + 1 : end]).decode("ascii")), end
+    @classmethod
+    def get_random(cls, complexity, rng=random):
+        if complexity < cls.length_min + cls.complexity_cost:
             raise IncorrectComplexity()
         if complexity - cls.complexity_cost > cls.length_max:
             raise IncorrectComplexity() #we don't want substrings longer than 3, else
                 # the rule is usually something like (string contains 'qjke') or (length
                 # at least 3), which is bad because that substring is *never* in the
                 # string.
-        return cls(random_str(complexity - cls.complexity_cost))
+        return cls(random_str(complexity - cls.complexity_cost, rng))
 
 @register_concrete_rule
 class ContainmentRule(SubstringRule):
     """Rule: string must contain some substring."""
+    __slots__ = ()
     probability_weight = .4
     def __call__(self, s):
         return self.substr in s
     def __str__(self):
         return "contains %r" % self.substr
+    def pattern(self):
+        if len(self.substr) == 1:
+            return None # most words contain common letters, and a step per match is then slower
+        return re.escape(self.substr.encode("ascii"))
 
 @register_concrete_rule
 class PrefixRule(SubstringRule):
     """Rule: String must start with some substring."""
+    __slots__ = ()
     probability_weight = .2
     length_max = 2
     def __call__(self, s):
         return s.startswith(self.substr)
     def __str__(self):
         return "starts with %r" % self.substr
+    def pattern(self):
+        return b"(?m:^" + re.escape(self.substr.encode("ascii")) + b")"
 
 @register_concrete_rule
 class SuffixRule(SubstringRule):
     """Rule: String must end with some substring."""
+    __slots__ = ()
     probability_weight = .2
     length_max = 2
     def __call__(self, s):
         return s.endswith(self.substr)
     def __str__(self):
         return "ends with %r" % self.substr
+    def pattern(self):
+        return b"(?m:" + re.escape(self.substr.encode("ascii")) + b"$)"
 
 
 class CharacterCountRule(Rule):
     """Abstract base for rules which involve counting number
     of occurances of characters."""
+    __slots__ = ("count_target",)
     probability_weight = .2
     complexity_cost = 3
     count_min = math.ceil(0.7 * STRINGS_GENERALLY_LONGER_THAN)
@@ -318,14 +690,24 @@ class CharacterCountRule(Rule):
         raise NotImplementedError("abstract base class")
     def __str__(self):
         raise NotImplementedError("abstract base class")
+    def neighbours(self):
+        return [type(self)(count) for count in (self.count_target - 1, self.count_target + 1)
+                if count >= 1]
+    def pack_params(self, out):
+        out.append(self.count_target)
+    @classmethod
+    def unpack_params(cls, data, pos):
+        return cls(data[pos]), pos + 1
     @classmethod
-    def get_random(cls, complexity):
+    def get_random(cls, complexity, rng=random):
         if not (2 <= complexity <= 3):
             raise IncorrectComplexity()
-        return cls(randint(cls.count_min, cls.count_max))
+        return cls(rng.randint(cls.count_min, cls.count_max))
+
+VOWELS = "aeiou"
 
 def count_vowels(s):
-    vowels = "aeiou"
+    vowels = VOWELS
     s = s.lower()
     return sum(letter in vowels for letter in s)
 
@@ -337,6 +719,7 @@ def count_consonants(s):
 @register_concrete_rule
 class VowelCount(CharacterCountRule):
     """Rule: String must contain at least N vowels."""
+    __slots__ = ()
     probability_weight = .08
     def __call__(self, s):
         return count_vowels(s) >= self.count_target
@@ -346,6 +729,7 @@ class VowelCount(CharacterCountRule):
 @register_concrete_rule
 class ConsonantCount(CharacterCountRule):
     """Rule: String must contain at least N consonants."""
+    __slots__ = ()
     probability_weight = .08
     def __call__(self, s):
         return count_consonants(s) >= self.count_target
@@ -355,6 +739,7 @@ class ConsonantCount(CharacterCountRule):
 @register_concrete_rule
 class UniqueCount(CharacterCountRule):
     """Rule: String must contain at least N unique letters."""
+    __slots__ = ()
     probability_weight = .12
     def __call__(self, s):
         return len(set(s)) >= self.count_target
@@ -362,6 +747,176 @@ class UniqueCount(CharacterCountRule):
         return "contains at least %r unique letters" % self.count_target
 
 
+@lru_cache(maxsize=256)
+def wildcard_regex(substr):
+    """Returns the compiled regex for WildcardContainmentRule(substr). It's compiled
+    once per substring, rather than on every call, as reasonable() calls the rule on
+    many words; and only when called, as most rules generated are never called."""
+    return re.compile(substr.replace("_", "."))
+
+@register_concrete_rule
+class WildcardContainmentRule(SubstringRule):
+    """Rule: string must contain some substring, where each "_" in the
+    substring can be any letter. E.g. "sit" and "sat" contain "s_t", but
+    "seat" doesn't."""
+    __slots__ = ()
+    probability_weight = .1
+    indexed_mask = True
+    complexity_cost = 1 # for the wildcard
+    length_min = 2 # fixed letters; with just one, this would be (contains letter) and (length at least N)
+    def __call__(self, s):
+        return wildcard_regex(self.substr).search(s) is not None
+    def __str__(self):
+        return "contains %r (where each _ is any letter)" % self.substr
+    def word_mask(self):
+        index = dictionary_index()
+        if index is None:
+            return super().word_mask()
+        fixed = [(offset, letter) for offset, letter in enumerate(self.substr) if letter != "_"]
+        mask = 0
+        for start in range(index.max_length - len(self.substr) + 1):
+            start_mask = index.min_length_mask(start + len(self.substr))
+            for offset, letter in fixed:
+                start_mask &= index.letter_mask(start + offset, letter)
+            mask |= start_mask
+        return mask
+    def neighbours(self):
+        """The substring with one more letter made a wildcard."""
+        fixed = [i for i, letter in enumerate(self.substr) if letter != "_"]
+        if len(fixed) <= self.length_min:
+            return []
+        return [type(self)(self.substr[:i] + "_" + self.substr[i+1:]) for i in fixed]
+    @classmethod
+    def get_random(cls, complexity, rng=random):
+        if not (cls.length_min + cls.complexity_cost <= complexity <= cls.length_max + cls.complexity_cost):
+            raise IncorrectComplexity()
+        letters = random_str(complexity - cls.complexity_cost, rng)
+        wildcard_pos = rng.randint(1, len(letters) - 1) # never at the ends, else it'd just be a length limit
+        return cls(letters[:wildcard_pos] + "_" + letters[wildcard_pos:])
+
+@register_concrete_rule
+class SubsequenceRule(SubstringRule):
+    """Rule: string must contain some letters in order, but not necessarily
+    consecutively. E.g. "tab" and "tarb" both satisfy *a*b*."""
+    __slots__ = ()
+    probability_weight = .1
+    indexed_mask = True
+    complexity_cost = 1
+    length_min = 2 # with one letter, this is just a ContainmentRule
+    def __call__(self, s):
+        letters = iter(s)
+        return all(letter in letters for letter in self.substr) # `in` consumes the iterator
+    def __str__(self):
+        return "contains the letters %s in that order, not necessarily consecutively" % \
+                ", ".join(map(repr, self.substr))
+    def word_mask(self):
+        # matched[k] is the mask of words containing the first k letters of the subsequence
+        # before the current position
+        index = dictionary_index()
+        if index is None:
+            return super().word_mask()
+        matched = [ALL_WORDS_MASK] + [0] * len(self.substr)
+        for position in range(index.max_length):
+            for k in reversed(range(len(self.substr))):
+                matched[k + 1] |= matched[k] & index.letter_mask(position, self.substr[k])
+        return matched[-1]
+    def neighbours(self):
+        if len(self.substr) <= self.length_min:
+            return []
+        return [type(self)(self.substr[:i] + self.substr[i+1:]) for i in range(len(self.substr))]
+
+@register_concrete_rule
+class RepetitionCount(CharacterCountRule):
+    """Rule: String must contain some letter repeated at least N times in a
+    row. E.g. "hoot" and "see" both contain 2 repetitions."""
+    __slots__ = ()
+    probability_weight = .05
+    indexed_mask = True
+    count_min = 2
+    count_max = 2
+        # Random rules always have N = 2: the shipped words.txt has no word with a letter
+        # three times in a row, so with N = 3 the rule would never be reasonable, and
+        # drawing it would only waste tries. Rules with other N still work (e.g. as
+        # neighbours()), for dictionaries where they make sense.
+    def __call__(self, s):
+        run = 0
+        for i, letter in enumerate(s):
+            run = run + 1 if i and letter == s[i-1] else 1
+            if run >= self.count_target:
+                return True
+        return False
+    def __str__(self):
+        return "contains some letter repeated at least %r times in a row" % self.count_target
+    def word_mask(self):
+        index = dictionary_index()
+        if index is None:
+            return super().word_mask()
+        return index.min_run_masks[self.count_target] if self.count_target < len(index.min_run_masks) else 0
+    def neighbours(self):
+        return [type(self)(count) for count in (self.count_target - 1, self.count_target + 1)
+                if count >= 2]
+
+@register_concrete_rule
+class AlternationRule(Rule):
+    """Rule: String must alternate vowels and consonants, e.g. "soho"."""
+    __slots__ = ()
+    probability_weight = .05
+    indexed_mask = True
+    def __call__(self, s):
+        return all((a in VOWELS) != (b in VOWELS) for a, b in zip(s, s[1:]))
+    def __str__(self):
+        return "alternates vowels and consonants"
+    def word_mask(self):
+        index = dictionary_index()
+        if index is None:
+            return super().word_mask()
+        return index.alternating_mask
+    def pack_params(self, out):
+        pass
+    @classmethod
+    def unpack_params(cls, data, pos):
+        return cls(), pos
+    @classmethod
+    def get_random(cls, complexity, rng=random):
+        if complexity != 2:
+            raise IncorrectComplexity()
+        return cls()
+
+@register_concrete_rule
+class LengthMultipleRule(Rule):
+    """Rule: String's length must be a multiple of N (2 or 3)."""
+    __slots__ = ("divisor",)
+    probability_weight = .1
+    indexed_mask = True
+    divisors = (2, 3)
+    def __init__(self, divisor):
+        self.divisor = divisor
+    def __call__(self, s):
+        return len(s) % self.divisor == 0
+    def __str__(self):
+        return "length is a multiple of %r" % self.divisor
+    def word_mask(self):
+        index = dictionary_index()
+        if index is None:
+            return super().word_mask()
+        mask = 0
+        for length_mask in index.length_masks[::self.divisor]:
+            mask |= length_mask
+        return mask
+    def neighbours(self):
+        return [type(self)(divisor) for divisor in self.divisors if divisor != self.divisor]
+    def pack_params(self, out):
+        out.append(self.divisor)
+    @classmethod
+    def unpack_params(cls, data, pos):
+        return cls(data[pos]), pos + 1
+    @classmethod
+    def get_random(cls, complexity, rng=random):
+        if complexity != 2:
+            raise IncorrectComplexity()
+        return cls(rng.choice(cls.divisors))
+
+
 #NOTE maybe implement more rules
 
 if __name__ == "__main__":
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import calibration as c
+import rules as r
+
+class TestMeasure(unittest.TestCase):
+    def test_measure(self):
+        rule = r.DisjunctionRule(r.ContainmentRule("x"), r.NegationRule(r.LengthMinimumRule(3)))
+        stats = c.measure(rule)
+        num_accepted = len(list(filter(rule, r.ALL_WORDS)))
+        self.assertAlmostEqual(stats.accept_rate, num_accepted / len(r.ALL_WORDS))
+        self.assertEqual(stats.tree_size, 4)
+        self.assertGreater(stats.distinguishing_queries, 1)
+
+class TestFit(unittest.TestCase):
+    def test_exact_fit(self):
+        true_coefficients = [.5, 1., 2., -1.]
+        samples = []
+        for tree_size in range(1, 6):
+            for queries in (1., 4., 32.):
+                for accept_rate in (.1, .3, .5):
+                    stats = c.RuleStats(accept_rate, queries, tree_size)
+                    samples.append((stats, sum(a * b for a, b in
+                        zip(true_coefficients, c.features(stats)))))
+        for fitted, true in zip(c.fit_difficulty(samples), true_coefficients):
+            self.assertAlmostEqual(fitted, true, places=5)
+
+class TestLoggedGames(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.log_path = os.path.join(self.dir, "games.log")
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+    def log(self, rule, num_queries, outcome):
+        record = c.gamelog.GameRecord("rigid", "tester", 0., 1, str(rule),
+                [("word", True)] * num_queries, 1., outcome, None, r.rule_to_bytes(rule))
+        with c.gamelog.GameLog(self.log_path) as log:
+            log.append(record)
+    def test_samples(self):
+        self.assertEqual(c.logged_samples(self.log_path), [])
+        easy = r.PrefixRule("s")
+        hard = r.XorRule(r.ContainmentRule("e"), r.LengthMultipleRule(3))
+        self.log(easy, 3, "won")
+        self.log(hard, 8, "gave up")
+        with c.gamelog.GameLog(self.log_path) as log:
+            log.append(c.gamelog.GameRecord("rigid", "tester", 0., 1, "unrecorded", [], 1.,
+                "won", None))
+        samples = c.logged_samples(self.log_path)
+        self.assertEqual(samples, [(c.measure(easy), 3), (c.measure(hard), 8 + c.FAILED_GAME_QUERIES)])
+    def test_fitted_to_games(self):
+        fallback = c.calibrate(2, processes=1, seed=0, log_path=self.log_path)
+        self.assertEqual(fallback["fitted_to"], "complexity")
+        for length in range(c.MIN_LOGGED_GAMES):
+            self.log(r.LengthMinimumRule(length % 10 + 1), length % 10, "won")
+        cache = c.calibrate(2, processes=1, seed=0, log_path=self.log_path)
+        self.assertEqual(cache["fitted_to"], "games")
+        self.assertEqual(cache["num_games"], c.MIN_LOGGED_GAMES)
+        for band_rules in cache["bands"].values():
+            self.assertLessEqual(len(band_rules), 2) # as many as were generated at its complexity
+        self.assertEqual(sorted(data for band in cache["bands"].values() for data in band),
+                sorted(data for band in fallback["bands"].values() for data in band))
+
+class TestCache(unittest.TestCase):
+    def tearDown(self):
+        c._cache = None
+    def test_rule_for_difficulty(self):
+        rule = r.ConjunctionRule(r.ContainmentRule("e"), r.LengthMinimumRule(6))
+        c._cache = {"bands": {3: [r.rule_to_bytes(rule)]}}
+        chosen = c.rule_for_difficulty(3)
+        self.assertEqual(str(chosen), str(rule))
+        self.assertTrue(chosen.examples_accepted)
+        self.assertIsNone(c.rule_for_difficulty(4))
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -94,6 +94,172 @@ class TestUniqueCount(unittest.TestCase):
         self.assertFalse(rule(""))
         self.assertFalse(rule("o" * 10))
 
+class TestWildcardContainment(unittest.TestCase):
+    def test_call(self):
+        rule = r.WildcardContainmentRule("s_t")
+        self.assertTrue(rule("sit"))
+        self.assertTrue(rule("upset"))
+        self.assertFalse(rule("seat"))
+        self.assertFalse(rule("st"))
+        self.assertFalse(rule(""))
+
+class TestSubsequence(unittest.TestCase):
+    def test_call(self):
+        rule = r.SubsequenceRule("ab")
+        self.assertTrue(rule("tab"))
+        self.assertTrue(rule("tarb"))
+        self.assertFalse(rule("bat"))
+        self.assertFalse(rule("a"))
+        self.assertFalse(rule(""))
+
+class TestRepetitionCount(unittest.TestCase):
+    def test_call(self):
+        rule = r.RepetitionCount(2)
+        self.assertTrue(rule("hoot"))
+        self.assertTrue(rule("see"))
+        self.assertFalse(rule("hot"))
+        self.assertFalse(rule("sets"))
+        self.assertFalse(rule(""))
+        self.assertTrue(r.RepetitionCount(3)("zzz"))
+        self.assertFalse(r.RepetitionCount(3)("zzaz"))
+
+class TestAlternation(unittest.TestCase):
+    def test_call(self):
+        rule = r.AlternationRule()
+        self.assertTrue(rule("soho"))
+        self.assertTrue(rule("abab"))
+        self.assertTrue(rule("x"))
+        self.assertFalse(rule("soot"))
+        self.assertFalse(rule("strong"))
+
+class TestLengthMultiple(unittest.TestCase):
+    def test_call(self):
+        rule = r.LengthMultipleRule(3)
+        self.assertTrue(rule("abc"))
+        self.assertTrue(rule("o" * 9))
+        self.assertTrue(rule(""))
+        self.assertFalse(rule("o" * 4))
+
+class TestSerialization(unittest.TestCase):
+    def test_round_trip(self):
+        rule = r.XorRule(r.NegationRule(r.PrefixRule("qu")),
+                r.ConjunctionRule(r.LengthMinimumRule(6), r.UniqueCount(4)))
+        data = r.rule_to_bytes(rule)
+        self.assertEqual(len(data), 11)
+        self.assertEqual(str(r.rule_from_bytes(data)), str(rule))
+        rule = r.DisjunctionRule(r.AlternationRule(), r.ConjunctionRule(
+            r.WildcardContainmentRule("a_c"), r.LengthMultipleRule(2)))
+        self.assertEqual(str(r.rule_from_bytes(r.rule_to_bytes(rule))), str(rule))
+    def test_random_round_trip(self):
+        for i in range(20):
+            rule = r.random_rule(5)
+            self.assertEqual(str(r.rule_from_bytes(r.rule_to_bytes(rule))), str(rule))
+    def test_trailing_bytes(self):
+        with self.assertRaises(ValueError):
+            r.rule_from_bytes(r.rule_to_bytes(r.LengthMinimumRule(5)) + b"\0")
+
+class TestCompactRules(unittest.TestCase):
+    def test_no_dict(self):
+        for cls in r.concrete_rules:
+            self.assertFalse(hasattr(cls.__new__(cls), "__dict__"), cls.__name__)
+    def test_examples(self):
+        rule = r.random_rule(4)
+        self.assertTrue(all(rule(w) for w in rule.examples_accepted))
+        self.assertFalse(any(rule(w) for w in rule.examples_rejected))
+        self.assertEqual(len(rule.accepted_indices) + len(rule.rejected_indices),
+                r.REASONABILITY_SAMPLE_SIZE)
+    def test_subrules_discard_examples(self):
+        rule = r.DisjunctionRule.get_random(4)
+        self.assertFalse(hasattr(rule.test1, "accepted_indices"))
+        self.assertFalse(hasattr(rule.test2, "rejected_indices"))
+
+class TestWordMask(unittest.TestCase):
+    def check(self, rule):
+        mask = rule.word_mask()
+        for i in range(0, len(r.ALL_WORDS), 97):
+            self.assertEqual(bool(mask >> i & 1), rule(r.ALL_WORDS[i]), str(rule))
+    def test_combinations(self):
+        self.check(r.XorRule(r.NegationRule(r.SuffixRule("s")),
+                r.DisjunctionRule(r.LengthMinimumRule(9), r.ConjunctionRule(r.PrefixRule("b"),
+                    r.VowelCount(3)))))
+    def test_random(self):
+        for i in range(10):
+            self.check(r.random_rule(6))
+    def test_indexed_rules(self):
+        for rule in (r.WildcardContainmentRule("s_t"), r.WildcardContainmentRule("a__e"),
+                r.SubsequenceRule("tre"), r.RepetitionCount(2), r.AlternationRule(),
+                r.LengthMultipleRule(2), r.LengthMultipleRule(3), r.LengthMinimumRule(7)):
+            self.assertEqual(rule.word_mask(), r.mask_from_predicate(rule), str(rule))
+    def test_random_indices_from_mask(self):
+        r.dictionary_index()
+        for rule in (r.ConjunctionRule(r.LengthMinimumRule(6), r.SubsequenceRule("tre")),
+                r.NegationRule(r.AlternationRule())):
+            self.assertTrue(rule.cheap_word_mask(), str(rule))
+            accepted, rejected = r.test_random_indices(rule, 500, r.random.Random(0))
+            sample = r.ALL_WORDS.sample_indexed(500, r.random.Random(0))
+            self.assertEqual(list(accepted), [i for i, word in sample if rule(word)])
+            self.assertEqual(list(rejected), [i for i, word in sample if not rule(word)])
+        self.assertFalse(r.DisjunctionRule(r.PrefixRule("un"), r.SuffixRule("ness")).cheap_word_mask())
+    def test_streamed_dictionary(self):
+        rules = (r.WildcardContainmentRule("s_t"), r.SubsequenceRule("tre"), r.RepetitionCount(2),
+                r.AlternationRule(), r.LengthMultipleRule(3), r.LengthMinimumRule(7))
+        indexed_masks = [rule.word_mask() for rule in rules]
+        in_memory, index = r.ALL_WORDS, r._dictionary_index
+        r.ALL_WORDS, r._dictionary_index = r.wordsource.StreamingWords(r.WORDS_PATH), None
+        r.mask_cache.clear()
+        try:
+            self.assertIsNone(r.dictionary_index())
+            self.assertEqual([rule.word_mask() for rule in rules], indexed_masks)
+        finally:
+            r.ALL_WORDS, r._dictionary_index = in_memory, index
+            r.mask_cache.clear()
+    def test_scanned_rules(self):
+        for rule in (r.ContainmentRule("ab"), r.ContainmentRule("ing"), r.PrefixRule("s"),
+                r.PrefixRule("qu"), r.SuffixRule("s"), r.SuffixRule("ed"),
+                r.DisjunctionRule(r.PrefixRule("un"), r.SuffixRule("ness")),
+                r.DisjunctionRule(r.ContainmentRule("es"), r.SuffixRule("s"))):
+            self.assertIsNotNone(rule.pattern())
+            self.assertEqual(r.mask_from_pattern(rule.pattern()), r.mask_from_predicate(rule), str(rule))
+        self.assertIsNone(r.ContainmentRule("e").pattern())
+        self.assertIsNone(r.DisjunctionRule(r.PrefixRule("s"), r.VowelCount(3)).pattern())
+    def test_neighbours(self):
+        rule = r.ConjunctionRule(r.ContainmentRule("ab"), r.LengthMinimumRule(5))
+        self.assertEqual(set(map(str, rule.neighbours())), {
+            "contains 'ab'", "length at least 5",
+            "(contains 'b') and (length at least 5)", "(contains 'a') and (length at least 5)",
+            "(contains 'ab') and (length at least 4)", "(contains 'ab') and (length at least 6)"})
+
+class TestReproducible(unittest.TestCase):
+    def test_seeded(self):
+        def generate(seed):
+            rng = r.random.Random(seed)
+            rule = r.random_rule(6, rng=rng)
+            return r.rule_to_bytes(rule), rule.examples_accepted, rule.examples_rejected
+        self.assertEqual(generate(1234), generate(1234))
+        self.assertNotEqual(generate(1234)[0], generate(4321)[0])
+
+class TestRuleClassSampler(unittest.TestCase):
+    def check_distribution(self, forbidden_classes):
+        legal = [cls for cls in r.concrete_rules if cls not in forbidden_classes]
+        sampler = r.rule_classes.excluding(forbidden_classes)
+        self.assertIs(sampler, r.rule_classes.excluding(list(forbidden_classes)))
+        rng = r.random.Random(0)
+        num_draws = 200000
+        counts = {cls: 0 for cls in legal}
+        for i in range(num_draws):
+            counts[sampler.sample(rng)] += 1
+        total_weight = sum(cls.probability_weight for cls in legal)
+        chi_squared = 0
+        for cls in legal:
+            expected = num_draws * cls.probability_weight / total_weight
+            chi_squared += (counts[cls] - expected) ** 2 / expected
+        # five standard deviations above the mean of the chi-squared distribution
+        degrees_of_freedom = len(legal) - 1
+        self.assertLess(chi_squared, degrees_of_freedom + 5 * r.math.sqrt(2 * degrees_of_freedom))
+    def test_distribution(self):
+        self.check_distribution([])
+        self.check_distribution([r.NegationRule, r.ConjunctionRule, r.ContainmentRule])
+
 
 if __name__ == "__main__":
 	unittest.main()
@@ -2,10 +2,29 @@
 
 # Zendo-like game; uses rules.py to construct rules and then lets user test or guess the rule.
 
-from random import choice, shuffle, randint
+from random import Random
+from argparse import ArgumentParser
+from getpass import getuser
+from os import path
 import re
+import sys
+import time
 
-import rules
+sys.path.append(path.join(path.dirname(path.realpath(__file__)), "..", "shared"))
+import profiling
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Rigid String Zendo.")
+    parser.add_argument("--seed", type=int, help="seed for the random number generator, "
+            "to replay the same rule and examples")
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    profiling.start_from_args(args) # before the imports below, so loading them is profiled
+
+with profiling.phase("import"):
+    import rules
+    import calibration
+    import gamelog
 
 
 # Configuration
@@ -14,13 +33,19 @@ import rules
 NUM_TESTS = lambda d: 3 + int(d/2)
     # Number of words to test when the user claims GOTIT. This is a function of difficulty.
 
+GAMELOG_PATH = path.join(path.dirname(path.realpath(__file__)), "..", "games.log")
+    # Where finished games are logged, so users can track their statistics.
+
 
 # Global variables
 ########################################################################
 
 known_words = {}
 num_asks = 0
+queries = [] # (word, accepted) pairs the user asked about, in order
 difficulty = None
+start_time = None
+rng = Random() # source of all randomness in the game; seeded by --seed
 
 
 # Game logic
@@ -34,21 +59,22 @@ def test_user_GOTIT():
     num_tests = NUM_TESTS(difficulty)
     print("You will be asked to judge %s strings. Judge all of them correctly (as the rule would)" % num_tests)
     print("and you win, but get any wrong and you lose.")
-    num_to_accept = randint(0, num_tests-2) + 1
+    num_to_accept = rng.randint(0, num_tests-2) + 1
         # this ensures we always get at least 1 accepted and 1 rejected, to prevent
         # user from just guessing based on the base rate.
     num_to_reject = num_tests - num_to_accept
 
     words_to_accept = list(filter(lambda w: w not in known_words, rule.examples_accepted))
     words_to_reject = list(filter(lambda w: w not in known_words, rule.examples_rejected))
-    while len(words_to_accept) < num_to_accept or len(words_to_reject) < num_to_reject:
-        new_accepted, new_rejected = rules.test_random_words(rule, 100)
-        words_to_accept.extend(filter(lambda w: w not in known_words, new_accepted))
-        words_to_reject.extend(filter(lambda w: w not in known_words, new_rejected))
-    shuffle(words_to_accept)
-    shuffle(words_to_reject)
+    with profiling.phase("draw examples"):
+        while len(words_to_accept) < num_to_accept or len(words_to_reject) < num_to_reject:
+            new_accepted, new_rejected = rules.test_random_words(rule, 100, rng)
+            words_to_accept.extend(filter(lambda w: w not in known_words, new_accepted))
+            words_to_reject.extend(filter(lambda w: w not in known_words, new_rejected))
+    rng.shuffle(words_to_accept)
+    rng.shuffle(words_to_reject)
     words_to_test = words_to_accept[:num_to_accept] + words_to_reject[:num_to_reject]
-    shuffle(words_to_test)
+    rng.shuffle(words_to_test)
     assert len(words_to_test) == num_tests
 
     for word in words_to_test:
@@ -66,6 +92,17 @@ def test_user_GOTIT():
             return False
     return True
 
+def log_game(outcome):
+    """Saves the finished game to the game log, and shows the user's record at this
+    difficulty."""
+    record = gamelog.GameRecord("rigid", getuser(), time.time(), difficulty, str(rule), queries,
+            time.time() - start_time, outcome, None, rules.rule_to_bytes(rule))
+    with profiling.phase("log game"), gamelog.GameLog(GAMELOG_PATH) as log:
+        log.append(record)
+        stats = log.stats(game="rigid", player=record.player, difficulty=difficulty)
+    print("\nAt difficulty %s you have won %s of %s games, testing %.1f words on average." %
+            (difficulty, stats.num("won"), stats.count, stats.mean_queries))
+
 def main_game_loop():
     """Main loop of the game. User can test string, give up, or claim to know rule.
     Returns True if another round is needed, False otherwise."""
@@ -74,9 +111,11 @@ def main_game_loop():
     global num_asks
     if command == "GIVEUP":
         print("\nThe rule was:  ", str(rule))
+        log_game("gave up")
         return False
     elif command == "GOTIT":
-        if test_user_GOTIT():
+        won = test_user_GOTIT()
+        if won:
             print("\nYOU WIN!! :D")
         else:
             print("\nYou lose :(")
@@ -87,6 +126,7 @@ def main_game_loop():
         print("Known classifications at the time you typed GOTIT were:")
         for k, v in known_words.items():
             print("\t" + k.ljust(30) + " : " + ("accepted" if v else "rejected"))
+        log_game("won" if won else "lost")
         return False
     else: # command is a string to test
         if re.match("^[a-z]*$", command) is None: # allows empty string
@@ -94,23 +134,31 @@ def main_game_loop():
         else:
             accepted = rule(command)
             known_words[command] = accepted
+            queries.append((command, accepted))
             print("String %r is:  %s" % (command, ("ACCEPTED" if accepted else "REJECTED")))
             num_asks += 1
         return True
 
 if __name__ == "__main__":
+    rng = Random(args.seed)
+
     difficulty = int(input("Enter rule complexity (2 is easy, 4 is moderate, 7 is difficult, 12 is ridiculous): "))
-    print("Generating rule...")
-    rule = rules.random_rule(difficulty, top_level=True)
+    with profiling.phase("generate rule"):
+        rule = calibration.rule_for_difficulty(difficulty, rng)
+        if rule is None:
+            print("(No calibrated rules for this difficulty; run calibration.py to build them.)")
+            print("Generating rule...")
+            rule = rules.random_rule(difficulty, top_level=True, rng=rng)
     print("Generated rule.")
 
-    example_accepted = choice(rule.examples_accepted)
+    example_accepted = rng.choice(rule.examples_accepted)
     known_words[example_accepted] = True
-    example_rejected = choice(rule.examples_rejected)
+    example_rejected = rng.choice(rule.examples_rejected)
     known_words[example_rejected] = False
     print("\nExample of ACCEPTED string: %s"   % example_accepted)
     print(  "Example of REJECTED string: %s\n" % example_rejected)
 
+    start_time = time.time()
     while main_game_loop():
         pass # loop while it returns True
 
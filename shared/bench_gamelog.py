@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+
+# Measures how fast games can be written to, and statistics read from, a GameLog.
+# Usage: bench_gamelog.py [number of games]
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import gamelog
+
+
+NUM_GAMES = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+if __name__ == "__main__":
+    temp_dir = tempfile.mkdtemp()
+    try:
+        log_path = os.path.join(temp_dir, "games.log")
+        queries = [("word%s" % i, i % 2 == 0) for i in range(8)]
+        start = time.perf_counter()
+        with gamelog.GameLog(log_path) as log:
+            for i in range(NUM_GAMES):
+                log.append(gamelog.GameRecord("rigid", "player%s" % (i % 50), time.time(),
+                    i % 12 + 1, "(length at least 6) or (contains 'qu')", queries, 60.,
+                    gamelog.OUTCOMES[i % 3], None))
+        write_time = time.perf_counter() - start
+        print("Wrote %s games in %.2fs: %.0f games per second, %.1f bytes per game" %
+                (NUM_GAMES, write_time, NUM_GAMES / write_time,
+                    os.path.getsize(log_path) / NUM_GAMES))
+
+        start = time.perf_counter()
+        with gamelog.GameLog(log_path) as log:
+            opened = time.perf_counter()
+            stats = log.stats(player="player7", difficulty=4)
+            queried = time.perf_counter()
+        print("Opened log in %.4fs, then got stats over %s games in %.6fs" %
+                (opened - start, stats.count, queried - opened))
+    finally:
+        shutil.rmtree(temp_dir)
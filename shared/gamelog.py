@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+
+# Append-only log of played games, shared by all the game modes, so users can track
+# their statistics (e.g. whether they're getting better).
+#
+# Records are written to the log file in a compact binary form, buffered and written
+# in bulk, and never fsynced. Alongside it we keep a pickled index (in "<log>.idx")
+# mapping each (game, player, difficulty) to its record offsets and running totals, so
+# statistics never need the whole history to be read. If the index is missing or
+# behind the log (e.g. after a crash), it's caught up by scanning only the records
+# written after the point it covers. A record left half-written by a crash at the end
+# of the log is truncated away then. Writers lock the log file, and catch up on records
+# other processes have written before adding their own, so several games can have the
+# log open at once.
+
+from array import array
+from collections import namedtuple
+from contextlib import contextmanager
+import math
+import os
+import pickle
+import struct
+try:
+    import fcntl
+except ImportError: # not on Windows; there, concurrently open logs aren't safe
+    fcntl = None
+
+
+# Configuration
+########################################################################
+
+BUFFER_SIZE = 1 << 16 # bytes of encoded records to buffer before writing them out
+
+
+# Constants
+########################################################################
+
+OUTCOMES = ("won", "lost", "gave up", "scored")
+    # "scored" is for games (like Fuzzy Zendo) with a score rather than a win or loss
+
+INDEX_VERSION = 1
+
+LENGTH_STRUCT = struct.Struct("<I") # length of each encoded record, which precedes it
+FIXED_STRUCT = struct.Struct("<dHBIdd")
+    # timestamp, difficulty, outcome, number of queries, duration, log score
+STR_LENGTH_STRUCT = struct.Struct("<H")
+
+
+# Records
+########################################################################
+
+class CorruptRecordError(ValueError):
+    """Raised when a game log record can't be decoded."""
+    pass
+
+GameRecord = namedtuple("GameRecord", ["game", "player", "timestamp", "difficulty", "rule",
+    "queries", "duration", "outcome", "log_score", "encoded_rule"], defaults=(None,))
+GameRecord.__doc__ = """One finished game.
+`game` names the game mode (e.g. "rigid"), `rule` is the rule's description,
+`queries` is a list of (word, accepted) pairs in the order the player asked them,
+`duration` is in seconds, `outcome` is one of OUTCOMES and `log_score` is the
+player's Bayes score, or None for games that don't have one. `encoded_rule` is
+optionally the rule in its game's binary encoding (bytes), so it can be rebuilt."""
+
+def _pack_str(out, s):
+    encoded = s.encode("utf-8")
+    out += STR_LENGTH_STRUCT.pack(len(encoded))
+    out += encoded
+
+def _unpack_str(data, pos):
+    (length,) = STR_LENGTH_STRUCT.unpack_from(data, pos)
+    pos += STR_LENGTH_STRUCT.size
+    return data[pos : pos + length].decode("utf-8"), pos + length
+
+def encode_record(record):
+    """Returns the binary encoding of `record`, including its length prefix."""
+    body = bytearray(FIXED_STRUCT.pack(record.timestamp, record.difficulty,
+        OUTCOMES.index(record.outcome), len(record.queries), record.duration,
+        math.nan if record.log_score is None else record.log_score))
+    for s in (record.game, record.player, record.rule):
+        _pack_str(body, s)
+    for word, accepted in record.queries:
+        body.append(1 if accepted else 0)
+        _pack_str(body, word)
+    if record.encoded_rule is not None:
+        # last, so that records written before this field existed still decode
+        body += STR_LENGTH_STRUCT.pack(len(record.encoded_rule))
+        body += record.encoded_rule
+    return LENGTH_STRUCT.pack(len(body)) + body
+
+def decode_record(data, pos=0):
+    """Decodes the record whose encoding (including length prefix) starts at
+    `data[pos]`. Returns the record and the position after its encoding.
+    Raises CorruptRecordError if it isn't a valid record."""
+    try:
+        (length,) = LENGTH_STRUCT.unpack_from(data, pos)
+        pos += LENGTH_STRUCT.size
+        end = pos + length
+        if end > len(data):
+            raise CorruptRecordError("game log record is truncated")
+        timestamp, difficulty, outcome, num_queries, duration, log_score = FIXED_STRUCT.unpack_from(data, pos)
+        pos += FIXED_STRUCT.size
+        game, pos = _unpack_str(data, pos)
+        player, pos = _unpack_str(data, pos)
+        rule, pos = _unpack_str(data, pos)
+        queries = []
+        for i in range(num_queries):
+            accepted = bool(data[pos])
+            word, pos = _unpack_str(data, pos + 1)
+            queries.append((word, accepted))
+        encoded_rule = None
+        if pos < end:
+            (rule_length,) = STR_LENGTH_STRUCT.unpack_from(data, pos)
+            pos += STR_LENGTH_STRUCT.size
+            encoded_rule = bytes(data[pos : pos + rule_length])
+            pos += rule_length
+        outcome = OUTCOMES[outcome]
+    except (struct.error, IndexError, UnicodeDecodeError) as e:
+        raise CorruptRecordError("corrupt game log record: %s" % e)
+    if pos != end:
+        raise CorruptRecordError("corrupt game log record: wrong length")
+    return GameRecord(game, player, timestamp, difficulty, rule, queries, duration,
+            outcome, None if math.isnan(log_score) else log_score, encoded_rule), end
+
+
+# Statistics
+########################################################################
+
+class GameStats(object):
+    """Running totals over a set of games."""
+    __slots__ = ("count", "outcome_counts", "total_queries", "total_duration",
+            "total_log_score", "num_log_scores")
+    def __init__(self):
+        self.count = 0
+        self.outcome_counts = [0] * len(OUTCOMES)
+        self.total_queries = 0
+        self.total_duration = 0.
+        self.total_log_score = 0.
+        self.num_log_scores = 0
+    def add(self, record):
+        self.count += 1
+        self.outcome_counts[OUTCOMES.index(record.outcome)] += 1
+        self.total_queries += len(record.queries)
+        self.total_duration += record.duration
+        if record.log_score is not None:
+            self.total_log_score += record.log_score
+            self.num_log_scores += 1
+    def merge(self, other):
+        self.count += other.count
+        for i, n in enumerate(other.outcome_counts):
+            self.outcome_counts[i] += n
+        self.total_queries += other.total_queries
+        self.total_duration += other.total_duration
+        self.total_log_score += other.total_log_score
+        self.num_log_scores += other.num_log_scores
+    def num(self, outcome):
+        """Number of games with the given outcome."""
+        return self.outcome_counts[OUTCOMES.index(outcome)]
+    @property
+    def mean_queries(self):
+        return self.total_queries / self.count if self.count else math.nan
+    @property
+    def mean_duration(self):
+        return self.total_duration / self.count if self.count else math.nan
+    @property
+    def mean_log_score(self):
+        return self.total_log_score / self.num_log_scores if self.num_log_scores else math.nan
+
+class _IndexEntry(object):
+    """Offsets and running totals of all games with one (game, player, difficulty)."""
+    __slots__ = ("offsets", "stats")
+    def __init__(self):
+        self.offsets = array("Q")
+        self.stats = GameStats()
+
+
+# The log itself
+########################################################################
+
+class GameLog(object):
+    """An append-only log of games, stored at `log_path`. Use as a context manager,
+    or call close() when done, so the buffer is written and the index saved.
+    Several processes may have the same log open at once: each takes a lock on the log
+    file while writing, and first catches up on whatever the others have written."""
+    def __init__(self, log_path, buffer_size=BUFFER_SIZE):
+        self.log_path = log_path
+        self.index_path = log_path + ".idx"
+        self.buffer_size = buffer_size
+        self.buffer = bytearray()
+        self.pending = [] # (record, length of its encoding) for each record in the buffer
+        self.log_file = open(log_path, "ab")
+        self.index = {}
+        self.index_end = 0 # end of the part of the log file covered by the index
+        with self._locked():
+            self._load_index()
+
+    @contextmanager
+    def _locked(self):
+        """Holds an exclusive lock on the log file (where file locks are available)."""
+        if fcntl is None:
+            yield
+            return
+        fcntl.flock(self.log_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self.log_file.fileno(), fcntl.LOCK_UN)
+
+    def _load_index(self):
+        """Loads the saved index, then catches it up. Call with the lock held."""
+        try:
+            with open(self.index_path, "rb") as index_file:
+                version, index_end, index = pickle.load(index_file)
+            if version == INDEX_VERSION and index_end <= os.fstat(self.log_file.fileno()).st_size:
+                self.index, self.index_end = index, index_end
+        except Exception:
+            # missing, corrupt, or from an incompatible version of this module (unpickling
+            # a renamed class raises AttributeError, for example); rebuild it from scratch
+            self.index, self.index_end = {}, 0
+        self._catch_up()
+
+    def _catch_up(self):
+        """Indexes the records written to the log file after the part the index covers,
+        e.g. by other processes, or before a crash. Call with the lock held, so that
+        no record is still being written."""
+        file_end = os.fstat(self.log_file.fileno()).st_size
+        if self.index_end >= file_end:
+            return
+        with open(self.log_path, "rb") as log_file:
+            log_file.seek(self.index_end)
+            data = log_file.read(file_end - self.index_end)
+        pos = 0
+        while pos < len(data):
+            if pos + LENGTH_STRUCT.size > len(data) or \
+                    pos + LENGTH_STRUCT.size + LENGTH_STRUCT.unpack_from(data, pos)[0] > len(data):
+                # a record only partly written before a crash; drop it
+                self.log_file.truncate(self.index_end + pos)
+                break
+            try:
+                record, end = decode_record(data, pos)
+                self._add_to_index(record, self.index_end + pos)
+            except CorruptRecordError:
+                end = pos + LENGTH_STRUCT.size + LENGTH_STRUCT.unpack_from(data, pos)[0]
+                # skip it; it has a valid length, so the records after it are intact
+            pos = end
+        self.index_end += pos
+
+    def _add_to_index(self, record, offset):
+        key = (record.game, record.player, record.difficulty)
+        entry = self.index.get(key)
+        if entry is None:
+            entry = self.index[key] = _IndexEntry()
+        entry.offsets.append(offset)
+        entry.stats.add(record)
+
+    def append(self, record):
+        """Adds `record` to the log. It's written out when the buffer fills up, or
+        on flush() or close()."""
+        encoded = encode_record(record)
+        self.pending.append((record, len(encoded)))
+        self.buffer += encoded
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def _write_buffer(self):
+        """Writes buffered records to the end of the log file, and indexes them at
+        where they landed. Call with the lock held, after _catch_up()."""
+        if self.buffer:
+            self.log_file.write(self.buffer)
+            self.log_file.flush()
+            for record, length in self.pending:
+                self._add_to_index(record, self.index_end)
+                self.index_end += length
+            self.buffer = bytearray()
+            self.pending = []
+
+    def flush(self):
+        """Writes buffered records to the log file, and indexes any records other
+        processes have written. Deliberately doesn't fsync."""
+        with self._locked():
+            self._catch_up()
+            self._write_buffer()
+
+    def save_index(self):
+        with self._locked():
+            self._catch_up()
+            self._write_buffer()
+            temp_path = self.index_path + ".tmp"
+            with open(temp_path, "wb") as index_file:
+                pickle.dump((INDEX_VERSION, self.index_end, self.index), index_file,
+                        pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, self.index_path)
+
+    def close(self):
+        if not self.log_file.closed:
+            self.save_index()
+            self.log_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _matching_entries(self, game, player, difficulty):
+        for (entry_game, entry_player, entry_difficulty), entry in self.index.items():
+            if game is not None and game != entry_game:
+                continue
+            if player is not None and player != entry_player:
+                continue
+            if difficulty is not None and difficulty != entry_difficulty:
+                continue
+            yield entry
+
+    def stats(self, game=None, player=None, difficulty=None):
+        """Returns GameStats over all games matching the given criteria (None
+        matches anything). Only consults the index (after flush(), so that it
+        includes any games just appended here or by other processes)."""
+        self.flush()
+        stats = GameStats()
+        for entry in self._matching_entries(game, player, difficulty):
+            stats.merge(entry.stats)
+        return stats
+
+    def players(self, game=None):
+        self.flush()
+        return sorted(set(player for (entry_game, player, difficulty) in self.index
+            if game is None or game == entry_game))
+
+    def records(self, game=None, player=None, difficulty=None):
+        """Yields the GameRecords matching the given criteria, in the order they
+        were logged, reading only those records from disk."""
+        self.flush()
+        offsets = sorted(offset for entry in self._matching_entries(game, player, difficulty)
+                for offset in entry.offsets)
+        with open(self.log_path, "rb") as log_file:
+            for offset in offsets:
+                log_file.seek(offset)
+                (length,) = LENGTH_STRUCT.unpack(log_file.read(LENGTH_STRUCT.size))
+                data = LENGTH_STRUCT.pack(length) + log_file.read(length)
+                yield decode_record(data)[0]
+
+
+if __name__ == "__main__":
+    raise Exception("Not intended to be called standalone.")
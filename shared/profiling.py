@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+
+# Profiling of named phases of a game, such as loading the dictionary or generating the
+# rule, for finding out where slow game starts spend their time. Code marks phases with
+#     with profiling.phase("generate rule"):
+#         ...
+# which does nothing unless profiling was started (by the games' --profile option).
+# Phases may nest, and are reported by their path, e.g. "generate rule/reasonable".
+# When profiling, each phase's wall time, CPU time and peak traced memory (tracemalloc)
+# are recorded, and optionally a cProfile dump and a collapsed-stack file (as read by
+# flamegraph.pl, speedscope etc.) sampled from the code run inside phases.
+
+import atexit
+from collections import Counter, OrderedDict
+from contextlib import nullcontext
+import cProfile
+from os import path
+import sys
+import threading
+import time
+import tracemalloc
+
+
+# Configuration
+########################################################################
+
+SAMPLE_INTERVAL = .001 # seconds between stack samples for the collapsed-stack file
+
+
+# Phases
+########################################################################
+
+class PhaseStats(object):
+    """Totals for one phase, over all the times it was run."""
+    __slots__ = ("calls", "wall_time", "cpu_time", "peak_memory")
+    def __init__(self):
+        self.calls = 0
+        self.wall_time = 0.
+        self.cpu_time = 0.
+        self.peak_memory = 0 # bytes traced by tracemalloc, at most, during the phase
+
+class Profiler(object):
+    """Records PhaseStats for phases run while it is active."""
+    def __init__(self, cprofile_path=None, stacks_path=None):
+        self.cprofile_path = cprofile_path
+        self.stacks_path = stacks_path
+        self.phases = OrderedDict() # phase path -> PhaseStats, in order first entered
+        self.running = [] # [path, start wall time, start CPU time, peak memory] of running phases, outermost first
+        self.stacks = Counter() # collapsed stack -> number of samples
+        self.cprofile = cProfile.Profile() if cprofile_path else None
+        self.sampler = None
+        self.stopped = threading.Event()
+
+    def start(self):
+        tracemalloc.start()
+        if self.cprofile:
+            self.cprofile.enable()
+        if self.stacks_path:
+            self.sampler = threading.Thread(target=self.sample_stacks,
+                    args=(threading.get_ident(),), daemon=True)
+            self.sampler.start()
+
+    def stop(self):
+        if self.sampler:
+            self.stopped.set()
+            self.sampler.join()
+            with open(self.stacks_path, "w") as stacks_file:
+                for stack, count in self.stacks.items():
+                    stacks_file.write("%s %s\n" % (stack, count))
+        if self.cprofile:
+            self.cprofile.disable()
+            self.cprofile.dump_stats(self.cprofile_path)
+        tracemalloc.stop()
+
+    def enter(self, name):
+        if self.running:
+            parent = self.running[-1]
+            parent[3] = max(parent[3], tracemalloc.get_traced_memory()[1])
+            phase_path = parent[0] + "/" + name
+        else:
+            phase_path = name
+        if phase_path not in self.phases:
+            self.phases[phase_path] = PhaseStats()
+        tracemalloc.reset_peak()
+        self.running.append([phase_path, time.perf_counter(), time.process_time(), 0])
+
+    def exit(self):
+        phase_path, wall_start, cpu_start, peak = self.running.pop()
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        stats = self.phases[phase_path]
+        stats.calls += 1
+        stats.wall_time += time.perf_counter() - wall_start
+        stats.cpu_time += time.process_time() - cpu_start
+        stats.peak_memory = max(stats.peak_memory, peak)
+        if self.running:
+            self.running[-1][3] = max(self.running[-1][3], peak)
+        tracemalloc.reset_peak()
+
+    def sample_stacks(self, thread_id):
+        """Run in a separate thread: samples the stack of thread `thread_id` while it's
+        in a phase, until stop() is called."""
+        while not self.stopped.wait(SAMPLE_INTERVAL):
+            if not self.running:
+                continue
+            frame = sys._current_frames().get(thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append("%s (%s)" % (code.co_name, path.basename(code.co_filename)))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def report(self, out=sys.stderr):
+        """Prints a table of the phases' statistics."""
+        width = max([len(phase_path) for phase_path in self.phases] + [5])
+        print("\n%s  %6s  %9s  %9s  %11s" % ("phase".ljust(width), "calls", "wall (s)",
+            "CPU (s)", "peak (MiB)"), file=out)
+        for phase_path, stats in self.phases.items():
+            print("%s  %6d  %9.3f  %9.3f  %11.1f" % (phase_path.ljust(width), stats.calls,
+                stats.wall_time, stats.cpu_time, stats.peak_memory / 2**20), file=out)
+
+class _Phase:
+    __slots__ = ("profiler", "name")
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+    def __enter__(self):
+        self.profiler.enter(self.name)
+    def __exit__(self, *exc_info):
+        self.profiler.exit()
+
+profiler = None # the active Profiler, if profiling
+_no_phase = nullcontext()
+
+def phase(name):
+    """Returns a context manager marking the code it runs as the phase `name`."""
+    if profiler is None:
+        return _no_phase
+    return _Phase(profiler, name)
+
+def start(cprofile_path=None, stacks_path=None):
+    """Starts profiling. It stops, and the report is printed, when the program exits."""
+    global profiler
+    profiler = Profiler(cprofile_path, stacks_path)
+    profiler.start()
+    atexit.register(finish)
+
+def finish():
+    """Stops profiling, if started, writes the requested files and prints the report."""
+    global profiler
+    if profiler is None:
+        return
+    finished, profiler = profiler, None
+    finished.stop()
+    finished.report()
+
+
+# Command line
+########################################################################
+
+def add_arguments(parser):
+    """Adds the profiling options to ArgumentParser `parser`."""
+    parser.add_argument("--profile", action="store_true", help="print the time and memory "
+            "taken by each phase of the game when it ends")
+    parser.add_argument("--profile-dump", metavar="PATH", help="also write cProfile "
+            "statistics to PATH (implies --profile)")
+    parser.add_argument("--profile-stacks", metavar="PATH", help="also write sampled stacks "
+            "in collapsed format, for flame graphs, to PATH (implies --profile)")
+
+def start_from_args(args):
+    """Starts profiling if the parsed arguments `args` ask for it."""
+    if args.profile or args.profile_dump or args.profile_stacks:
+        start(args.profile_dump, args.profile_stacks)
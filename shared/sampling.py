@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+
+# Weighted random sampling, shared by the rule generators. Rule generation draws rule
+# classes and features from fixed categorical distributions thousands of times per
+# generated rule, so these are preprocessed once: alias tables (Vose's method) give
+# O(1) draws with replacement, and weighted sampling without replacement uses one
+# random key per item (Efraimidis and Spirakis) instead of repeatedly renormalizing.
+
+import heapq
+import random
+
+
+class AliasTable(object):
+    """Samples indices 0..n-1 with probabilities proportional to `weights`, in
+    constant time per draw."""
+    __slots__ = ("probability", "alias")
+    def __init__(self, weights):
+        n = len(weights)
+        total = float(sum(weights))
+        if n == 0 or total <= 0:
+            raise ValueError("need at least one positive weight")
+        if min(weights) < 0:
+            raise ValueError("weights must be nonnegative")
+        scaled = [weight * n / total for weight in weights]
+        self.probability = [1.] * n # probability of keeping column i rather than taking its alias
+        self.alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1]
+        large = [i for i, p in enumerate(scaled) if p >= 1]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.probability[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] -= 1. - scaled[less]
+            (small if scaled[more] < 1 else large).append(more)
+        # whatever remains has probability 1, up to rounding error
+    def __len__(self):
+        return len(self.alias)
+    def sample(self, rng=random):
+        """Returns a random index."""
+        i = rng.randrange(len(self.alias))
+        return i if rng.random() < self.probability[i] else self.alias[i]
+
+class WeightedSampler(object):
+    """Samples from `items` with probabilities proportional to `weights`."""
+    __slots__ = ("items", "table")
+    def __init__(self, items, weights):
+        self.items = list(items)
+        self.table = AliasTable(weights)
+    def sample(self, rng=random):
+        return self.items[self.table.sample(rng)]
+
+class ClassSampler(object):
+    """Samples from `classes` with probabilities proportional to their
+    probability_weight attributes, leaving out any forbidden classes. `classes` is
+    kept by reference, so it may be a registry that's filled in after this is made,
+    as long as that's done before the first draw."""
+    __slots__ = ("classes", "samplers")
+    def __init__(self, classes):
+        self.classes = classes
+        self.samplers = {} # frozenset of forbidden classes -> sampler over the others
+    def excluding(self, forbidden_classes):
+        """Returns a (cached) WeightedSampler of the classes not in `forbidden_classes`."""
+        key = frozenset(forbidden_classes)
+        sampler = self.samplers.get(key)
+        if sampler is None:
+            legal_classes = [cls for cls in self.classes if cls not in key]
+            sampler = self.samplers[key] = WeightedSampler(legal_classes,
+                    [cls.probability_weight for cls in legal_classes])
+        return sampler
+
+def sample_without_replacement(items, weights, num_items, rng=random):
+    """Returns `num_items` distinct elements of `items`, distributed as if drawn one at
+    a time with probabilities proportional to the `weights` of those not yet drawn.
+    Items of weight 0 are never drawn."""
+    keys = [(rng.random() ** (1. / weight), i) for i, weight in enumerate(weights) if weight > 0]
+    if num_items > len(keys):
+        raise ValueError("can't sample %s of %s items" % (num_items, len(keys)))
+    return [items[i] for key, i in heapq.nlargest(num_items, keys)]
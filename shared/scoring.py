@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+
+# Bayes (logarithmic) scoring of the user's credences, shared by the game modes in which
+# the user says how likely they think each string is to be accepted.
+
+from math import log
+
+
+def read_credence(word):
+    """Asks the user for their belief that `word` will be accepted, until they enter
+    a valid probability. Returns it as a float."""
+    while True:
+        try:
+            print("Test this word:  %s" % word)
+            guess_str = input("Enter your belief that the true rule accepts this word, "
+                "from 0 to 1: ").strip()
+            guess = float(guess_str)
+            if guess > 1 or guess < 0:
+                raise ValueError()
+            return guess
+        except ValueError: # if user entered something that's not a valid probability
+            print("String must represent a valid probability.")
+            # try again
+
+def log_score(probabilities_of_correct):
+    """Returns the log score of predictions that gave the listed probabilities to
+    what actually happened."""
+    if 0 in probabilities_of_correct:
+        return float("-inf")
+    return sum(log(prob) for prob in probabilities_of_correct)
+
+def expected_log_score(probabilities):
+    """Returns the expected log score of predicting exactly the given probabilities of
+    acceptance, when those are the true probabilities. No predictor can expect more."""
+    return sum(p * log(p) + (1 - p) * log(1 - p) for p in probabilities if 0 < p < 1)
+
+
+if __name__ == "__main__":
+    raise Exception("Not intended to be called standalone.")
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import gamelog as g
+
+def make_record(player="alice", difficulty=4, outcome="won", log_score=None):
+    return g.GameRecord("rigid", player, 1500000000., difficulty, "contains 'x'",
+            [("xylophone", True), ("cat", False)], 12.5, outcome, log_score)
+
+class TestEncoding(unittest.TestCase):
+    def test_round_trip(self):
+        for record in (make_record(), make_record(outcome="scored", log_score=-1.25),
+                make_record()._replace(encoded_rule=b"\x05\x02ab")):
+            data = g.encode_record(record)
+            self.assertEqual(g.decode_record(data), (record, len(data)))
+
+class TestGameLog(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "games.log")
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+    def fill(self, log):
+        log.append(make_record("alice", 4, "won"))
+        log.append(make_record("alice", 4, "lost"))
+        log.append(make_record("alice", 7, "gave up"))
+        log.append(make_record("bob", 4, "won"))
+    def test_stats(self):
+        with g.GameLog(self.path) as log:
+            self.fill(log)
+            stats = log.stats(player="alice")
+            self.assertEqual(stats.count, 3)
+            self.assertEqual(stats.num("won"), 1)
+            self.assertEqual(stats.mean_queries, 2)
+            self.assertEqual(log.stats(difficulty=4).num("won"), 2)
+            self.assertEqual(log.stats(game="fuzzy").count, 0)
+            self.assertEqual(log.players(), ["alice", "bob"])
+    def test_records(self):
+        with g.GameLog(self.path, buffer_size=1) as log:
+            self.fill(log)
+        with g.GameLog(self.path) as log:
+            log.append(make_record("alice", 4, "scored", -2.))
+            outcomes = [record.outcome for record in log.records(player="alice", difficulty=4)]
+            self.assertEqual(outcomes, ["won", "lost", "scored"])
+            self.assertEqual(log.stats(player="alice").mean_log_score, -2.)
+    def test_rebuild_index(self):
+        with g.GameLog(self.path) as log:
+            self.fill(log)
+        os.remove(self.path + ".idx")
+        with g.GameLog(self.path) as log:
+            self.assertEqual(log.stats(player="alice").count, 3)
+    def test_stale_index(self):
+        with g.GameLog(self.path) as log:
+            self.fill(log)
+        log = g.GameLog(self.path)
+        self.fill(log)
+        log.flush() # without saving the index, as after a crash
+        with g.GameLog(self.path) as log:
+            self.assertEqual(log.stats().count, 8)
+            self.assertEqual(len(list(log.records(player="bob"))), 2)
+    def test_foreign_index(self):
+        with g.GameLog(self.path) as log:
+            self.fill(log)
+        with open(self.path + ".idx", "wb") as index_file:
+            index_file.write(b"cgamelog\nNoSuchClass\n.") # as if pickled by another version
+        with g.GameLog(self.path) as log:
+            self.assertEqual(log.stats().count, 4)
+    def test_concurrent(self):
+        first = g.GameLog(self.path)
+        second = g.GameLog(self.path)
+        first.append(make_record("alice", 4, "won"))
+        second.append(make_record("bob", 5, "lost"))
+        second.flush()
+        first.append(make_record("carol", 6, "gave up"))
+        first.close()
+        second.append(make_record("dave", 7, "won"))
+        self.assertEqual(second.stats().count, 4)
+        second.close()
+        for rebuild in (False, True):
+            if rebuild:
+                os.remove(self.path + ".idx")
+            with g.GameLog(self.path) as log:
+                self.assertEqual([record.player for record in log.records()],
+                        ["bob", "alice", "carol", "dave"])
+                self.assertEqual(log.stats(player="carol").num("gave up"), 1)
+    def test_torn_tail(self):
+        with g.GameLog(self.path) as log:
+            self.fill(log)
+        os.remove(self.path + ".idx")
+        with open(self.path, "ab") as log_file:
+            log_file.write(b"\x40\0\0\0abc") # the start of a record, as after a crash
+        with g.GameLog(self.path) as log:
+            self.assertEqual(log.stats().count, 4)
+            self.fill(log)
+        with g.GameLog(self.path) as log:
+            self.assertEqual(log.stats().count, 8)
+            self.assertEqual(len(list(log.records())), 8)
+    def test_corrupt_record(self):
+        data = bytearray(g.encode_record(g.GameRecord("rigid", "alice", 0., 3, "rule", [],
+            1., "won", None)))
+        data[0] -= 1 # length one short
+        with self.assertRaises(g.CorruptRecordError):
+            g.decode_record(bytes(data))
+
+
+if __name__ == "__main__":
+	unittest.main()
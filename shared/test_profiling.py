@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import profiling as p
+
+class TestDisabled(unittest.TestCase):
+    def test_no_op(self):
+        self.assertIsNone(p.profiler)
+        with p.phase("anything"):
+            pass
+        self.assertIsNone(p.profiler)
+
+class TestProfiler(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.stacks_path = os.path.join(self.dir, "stacks.txt")
+        self.dump_path = os.path.join(self.dir, "profile.prof")
+        self.profiler = p.profiler = p.Profiler(self.dump_path, self.stacks_path)
+        self.profiler.start()
+    def tearDown(self):
+        p.profiler = None
+        shutil.rmtree(self.dir)
+    def test_phases(self):
+        for i in range(3):
+            with p.phase("outer"):
+                with p.phase("allocate"):
+                    data = bytearray(4 * 2**20)
+                    del data
+                with p.phase("sleep"):
+                    time.sleep(.02)
+        self.profiler.stop()
+        self.assertEqual(list(self.profiler.phases), ["outer", "outer/allocate", "outer/sleep"])
+        outer = self.profiler.phases["outer"]
+        allocate = self.profiler.phases["outer/allocate"]
+        sleep = self.profiler.phases["outer/sleep"]
+        self.assertEqual(outer.calls, 3)
+        self.assertGreaterEqual(sleep.wall_time, .06)
+        self.assertLess(sleep.cpu_time, sleep.wall_time)
+        self.assertGreaterEqual(outer.wall_time, sleep.wall_time)
+        self.assertGreater(allocate.peak_memory, 4 * 2**20)
+        self.assertLess(sleep.peak_memory, 4 * 2**20)
+        self.assertGreaterEqual(outer.peak_memory, allocate.peak_memory)
+    def test_files(self):
+        with p.phase("busy"):
+            end = time.perf_counter() + .1
+            while time.perf_counter() < end:
+                pass
+        self.profiler.stop()
+        self.assertGreater(os.path.getsize(self.dump_path), 0)
+        with open(self.stacks_path) as stacks_file:
+            lines = stacks_file.read().splitlines()
+        self.assertTrue(lines)
+        for line in lines:
+            stack, count = line.rsplit(" ", 1)
+            self.assertGreater(int(count), 0)
+            self.assertIn("test_files (test_profiling.py)", stack)
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+from collections import Counter
+import random
+import unittest
+
+import sampling as s
+
+def chi_squared(counts, weights, num_draws):
+    total = sum(weights)
+    return sum((counts[i] - num_draws * weight / total) ** 2 / (num_draws * weight / total)
+            for i, weight in enumerate(weights))
+
+# 99.9th percentiles of the chi-squared distribution, by degrees of freedom
+CHI_SQUARED_999 = {3: 16.27, 4: 18.47}
+
+class TestAliasTable(unittest.TestCase):
+    def test_distribution(self):
+        weights = [.5, .2, .2, .08, .02]
+        table = s.AliasTable(weights)
+        rng = random.Random(0)
+        num_draws = 100000
+        counts = Counter(table.sample(rng) for i in range(num_draws))
+        self.assertLess(chi_squared(counts, weights, num_draws), CHI_SQUARED_999[len(weights) - 1])
+    def test_zero_weight(self):
+        table = s.AliasTable([0, 1, 0, 3])
+        rng = random.Random(0)
+        self.assertEqual({table.sample(rng) for i in range(1000)}, {1, 3})
+    def test_bad_weights(self):
+        with self.assertRaises(ValueError):
+            s.AliasTable([])
+        with self.assertRaises(ValueError):
+            s.AliasTable([0, 0])
+    def test_sampler(self):
+        sampler = s.WeightedSampler("abc", [1, 0, 1])
+        self.assertIn(sampler.sample(random.Random(0)), "ac")
+
+class TestClassSampler(unittest.TestCase):
+    def test_excluding(self):
+        class A: probability_weight = 1
+        class B: probability_weight = 2
+        class C: probability_weight = 0
+        registry = []
+        classes = s.ClassSampler(registry)
+        registry += [A, B, C]
+        sampler = classes.excluding([B])
+        self.assertIs(sampler, classes.excluding({B}))
+        self.assertIsNot(sampler, classes.excluding([]))
+        rng = random.Random(0)
+        self.assertEqual({sampler.sample(rng) for i in range(100)}, {A})
+        self.assertEqual({classes.excluding([]).sample(rng) for i in range(100)}, {A, B})
+
+class TestWithoutReplacement(unittest.TestCase):
+    def test_distinct(self):
+        rng = random.Random(0)
+        items = list(range(20))
+        for i in range(100):
+            chosen = s.sample_without_replacement(items, [i + 1 for i in items], 10, rng)
+            self.assertEqual(len(set(chosen)), 10)
+        with self.assertRaises(ValueError):
+            s.sample_without_replacement(items, [1] * 20, 21, rng)
+    def test_first_draw_distribution(self):
+        # the first item drawn is distributed according to the weights
+        weights = [4, 3, 2, 1]
+        rng = random.Random(0)
+        num_draws = 50000
+        counts = Counter(s.sample_without_replacement(range(4), weights, 2, rng)[0]
+                for i in range(num_draws))
+        self.assertLess(chi_squared(counts, weights, num_draws), CHI_SQUARED_999[len(weights) - 1])
+    def test_pair_probability(self):
+        # P(first two draws are 0 then 1) = 4/10 * 3/6
+        weights = [4, 3, 2, 1]
+        rng = random.Random(1)
+        num_draws = 50000
+        hits = sum(s.sample_without_replacement(range(4), weights, 2, rng) == [0, 1]
+                for i in range(num_draws))
+        self.assertAlmostEqual(hits / num_draws, .2, delta=.01)
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+
+import math
+import unittest
+
+import scoring
+
+class TestScoring(unittest.TestCase):
+    def test_log_score(self):
+        self.assertAlmostEqual(scoring.log_score([.5, .25]), math.log(.125))
+        self.assertEqual(scoring.log_score([.5, 0]), float("-inf"))
+    def test_expected_log_score(self):
+        self.assertAlmostEqual(scoring.expected_log_score([.5]), math.log(.5))
+        self.assertEqual(scoring.expected_log_score([0., 1.]), 0)
+
+
+if __name__ == "__main__":
+	unittest.main()
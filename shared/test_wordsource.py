@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+import wordsource as w
+
+class TestStreamingWords(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "words.txt")
+        rng = random.Random(0)
+        self.words = ["".join(rng.choice("abcdefgh") for j in range(rng.randint(1, 12)))
+                for i in range(1000)]
+        with open(self.path, "w") as words_file:
+            words_file.write("\n".join(self.words) + "\n")
+        self.streaming = w.StreamingWords(self.path, chunk_size=64)
+        self.in_memory = w.InMemoryWords(self.words)
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+    def test_sequence(self):
+        self.assertEqual(len(self.streaming), 1000)
+        self.assertEqual(list(self.streaming), self.words)
+        self.assertEqual(self.streaming[0], self.words[0])
+        self.assertEqual(self.streaming[-1], self.words[-1])
+        self.assertEqual(self.streaming[130:140], self.words[130:140])
+        with self.assertRaises(IndexError):
+            self.streaming[1000]
+    def test_chunks(self):
+        chunks = list(self.streaming.chunks())
+        self.assertEqual(len(chunks), 16)
+        for start, words in chunks:
+            self.assertEqual(words, self.words[start : start + len(words)])
+    def test_words_at(self):
+        indices = [999, 3, 500, 64, 63, 3]
+        self.assertEqual(self.streaming.words_at(indices), [self.words[i] for i in indices])
+    def test_words_at_decodes_only_needed(self):
+        with open(self.path, "ab") as words_file:
+            words_file.write(b"\xff\xfe\nlast\n") # not UTF-8, in the same chunk as "last"
+        streaming = w.StreamingWords(self.path, chunk_size=64)
+        self.assertEqual(streaming.words_at([1001, 999]), ["last", self.words[999]])
+        with self.assertRaises(UnicodeDecodeError):
+            streaming.words_at([1000])
+    def test_sample_matches_in_memory(self):
+        self.assertEqual(self.streaming.sample_indexed(100, random.Random(5)),
+                self.in_memory.sample_indexed(100, random.Random(5)))
+    def test_open_words(self):
+        self.assertIsInstance(w.open_words(self.path), w.InMemoryWords)
+        self.assertIsInstance(w.open_words(self.path, in_memory_limit=100), w.StreamingWords)
+
+
+if __name__ == "__main__":
+	unittest.main()
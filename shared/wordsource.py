@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+
+# Word sources: the dictionaries the games draw words from. Small dictionaries are
+# simply held in memory. Larger ones are streamed from disk in chunks of words, using
+# a sparse index of chunk offsets (built in one pass when the source is opened) for
+# random access, so that memory use is bounded however big the dictionary is.
+#
+# Every source is a Sequence of words, so indexing, len() and iteration work as they
+# would on a list, but whole-dictionary work should go through chunks(), and random
+# samples through sample() / sample_indexed().
+
+from array import array
+from collections.abc import Sequence
+from os import path
+import random
+
+import profiling
+
+
+# Configuration
+########################################################################
+
+IN_MEMORY_LIMIT = 64 * 1024 * 1024 # dictionaries bigger than this many bytes are streamed
+
+CHUNK_SIZE = 4096 # number of words per chunk when streaming
+
+
+# Word sources
+########################################################################
+
+class WordSource(Sequence):
+    """Abstract base class for dictionaries of words."""
+    def chunks(self):
+        """Yields (index of first word, list of words) for consecutive chunks of the
+        dictionary, in order."""
+        raise NotImplementedError("abstract base class")
+    def words_at(self, indices):
+        """Returns a list of the words at the given indices."""
+        raise NotImplementedError("abstract base class")
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return self.words_at(range(len(self))[i])
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("word index out of range")
+        return self.words_at([i])[0]
+    def __iter__(self):
+        for start, words in self.chunks():
+            yield from words
+    def sample_indexed(self, num_words, rng=random):
+        """Returns a list of `num_words` distinct random (index, word) pairs.
+        For a given `rng` state, the result doesn't depend on the kind of source."""
+        indices = rng.sample(range(len(self)), num_words)
+        return list(zip(indices, self.words_at(indices)))
+    def sample(self, num_words, rng=random):
+        """Returns a list of `num_words` distinct random words."""
+        return [word for i, word in self.sample_indexed(num_words, rng)]
+
+class InMemoryWords(WordSource):
+    """A dictionary held in memory as a list."""
+    def __init__(self, words):
+        self.words = words
+    def __len__(self):
+        return len(self.words)
+    def chunks(self):
+        yield 0, self.words
+    def words_at(self, indices):
+        words = self.words
+        return [words[i] for i in indices]
+    def __iter__(self):
+        return iter(self.words)
+
+class StreamingWords(WordSource):
+    """A dictionary streamed from a file with one word per line, which is never held
+    in memory all at once."""
+    def __init__(self, words_path, chunk_size=CHUNK_SIZE):
+        self.words_path = words_path
+        self.chunk_size = chunk_size
+        self.chunk_offsets = array("Q") # byte offset of the first word of each chunk
+        self.num_words = 0
+        with open(words_path, "rb") as words_file:
+            offset = 0
+            for line in words_file:
+                if self.num_words % chunk_size == 0:
+                    self.chunk_offsets.append(offset)
+                offset += len(line)
+                self.num_words += 1
+    def __len__(self):
+        return self.num_words
+    def _read_chunk(self, words_file, chunk_num):
+        words_file.seek(self.chunk_offsets[chunk_num])
+        num_words = min(self.chunk_size, self.num_words - chunk_num * self.chunk_size)
+        return [words_file.readline().rstrip(b"\r\n").decode("utf-8") for i in range(num_words)]
+    def chunks(self):
+        with open(self.words_path, "rb") as words_file:
+            for chunk_num in range(len(self.chunk_offsets)):
+                yield chunk_num * self.chunk_size, self._read_chunk(words_file, chunk_num)
+    def words_at(self, indices):
+        """Reads each chunk containing any of the words once, only as far as the last
+        word needed from it, and decodes only the words needed."""
+        by_chunk = {}
+        for position, i in enumerate(indices):
+            by_chunk.setdefault(i // self.chunk_size, []).append((i % self.chunk_size, position))
+        result = [None] * len(indices)
+        with open(self.words_path, "rb") as words_file:
+            for chunk_num in sorted(by_chunk):
+                words_file.seek(self.chunk_offsets[chunk_num])
+                line_num = 0
+                for needed, position in sorted(by_chunk[chunk_num]):
+                    while line_num <= needed:
+                        line = words_file.readline()
+                        line_num += 1
+                    result[position] = line.rstrip(b"\r\n").decode("utf-8")
+        return result
+
+def open_words(words_path, in_memory_limit=None):
+    """Returns a word source for the file at `words_path`, each of whose lines should
+    be one word. It's held in memory if it's at most `in_memory_limit` bytes
+    (default IN_MEMORY_LIMIT)."""
+    if in_memory_limit is None:
+        in_memory_limit = IN_MEMORY_LIMIT
+    with profiling.phase("load words"):
+        if path.getsize(words_path) <= in_memory_limit:
+            with open(words_path, "r") as words_file:
+                return InMemoryWords(words_file.read().splitlines())
+        return StreamingWords(words_path)
+
+
+if __name__ == "__main__":
+    raise Exception("Not intended to be called standalone.")
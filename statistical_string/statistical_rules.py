@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+
+# Probabilistic rules for Statistical Zendo. These reuse the rule trees of Rigid String
+# Zendo (rigid_string/rules.py), but each leaf, instead of accepting or rejecting, "fires"
+# with one probability if it would accept the string and another if it would reject it.
+# Leaves fire independently, and the combination rules combine their probabilities, so the
+# whole rule gives each string a probability of being accepted.
+
+from os import path
+import random
+import sys
+
+import numpy as np
+
+sys.path.append(path.join(path.dirname(path.realpath(__file__)), "..", "rigid_string"))
+import rules
+
+
+# Configuration
+########################################################################
+
+LEAF_PROBABILITY_IF_ACCEPTED = (.7, 1.) # range of leaves' probabilities of firing if they'd accept
+LEAF_PROBABILITY_IF_REJECTED = (0., .3) # range of leaves' probabilities of firing if they'd reject
+
+
+# Combining probabilities
+########################################################################
+
+# These work on floats and on NumPy arrays alike.
+COMBINATIONS = {
+        rules.ConjunctionRule: lambda x, y: x * y,
+        rules.DisjunctionRule: lambda x, y: x + y - x * y,
+        rules.XorRule: lambda x, y: x + y - 2 * x * y,
+        }
+
+def leaves(rule):
+    """Yields the leaves of a rule tree, left to right."""
+    subrules = rule.subrules()
+    if not subrules:
+        yield rule
+    for subrule in subrules:
+        yield from leaves(subrule)
+
+def mask_to_array(mask):
+    """Converts a word mask (see rules.Rule.word_mask) to a NumPy boolean array."""
+    num_words = len(rules.ALL_WORDS)
+    packed = np.frombuffer(mask.to_bytes(num_words // 8 + 1, "little"), dtype=np.uint8)
+    return np.unpackbits(packed, bitorder="little")[:num_words].astype(bool)
+
+
+# Rules
+########################################################################
+
+class ProbabilisticRule(object):
+    """A rigid rule tree whose leaves fire with given probabilities."""
+    def __init__(self, rule, leaf_probabilities):
+        """`rule`: a rules.Rule
+        `leaf_probabilities`: list with one (probability of firing if the leaf accepts,
+            probability of firing if it rejects) pair for each leaf, in leaves() order
+        """
+        self.rule = rule
+        self.leaf_probabilities = {id(leaf): probabilities
+                for leaf, probabilities in zip(leaves(rule), leaf_probabilities)}
+        self.word_probabilities = {} # memoized acceptance probabilities of individual strings
+        self.dictionary_probabilities = None # computed when first needed
+
+    def _evaluate(self, rule, leaf_value):
+        """Combines leaf_value(leaf, probability if accepted, probability if rejected)
+        up the tree from `rule`."""
+        if isinstance(rule, rules.NegationRule):
+            return 1 - self._evaluate(rule.test, leaf_value)
+        if type(rule) in COMBINATIONS:
+            return COMBINATIONS[type(rule)](self._evaluate(rule.test1, leaf_value),
+                    self._evaluate(rule.test2, leaf_value))
+        return leaf_value(rule, *self.leaf_probabilities[id(rule)])
+
+    def probability(self, s):
+        """Returns the probability that string `s` is accepted."""
+        if s not in self.word_probabilities:
+            self.word_probabilities[s] = self._evaluate(self.rule,
+                    lambda leaf, if_accepted, if_rejected: if_accepted if leaf(s) else if_rejected)
+        return self.word_probabilities[s]
+
+    def probabilities(self):
+        """Returns a NumPy array of the acceptance probability of every word in
+        rules.ALL_WORDS, computed with the leaves' word masks."""
+        if self.dictionary_probabilities is None:
+            self.dictionary_probabilities = self._evaluate(self.rule,
+                    lambda leaf, if_accepted, if_rejected:
+                        np.where(mask_to_array(leaf.word_mask()), if_accepted, if_rejected))
+        return self.dictionary_probabilities
+
+    def trials(self, s, num_trials, np_rng):
+        """Runs `num_trials` independent trials of string `s`, using NumPy Generator
+        `np_rng`. Returns the number of trials in which it was accepted."""
+        return int(np_rng.binomial(num_trials, self.probability(s)))
+
+    def __str__(self):
+        def describe(rule):
+            if isinstance(rule, rules.NegationRule):
+                return "not (%s)" % describe(rule.test)
+            if type(rule) in COMBINATIONS:
+                return "(%s) %s (%s)" % (describe(rule.test1), rule.name, describe(rule.test2))
+            if_accepted, if_rejected = self.leaf_probabilities[id(rule)]
+            return "%s [%r if so, else %r]" % (rule, if_accepted, if_rejected)
+        return describe(self.rule)
+
+def random_rule(complexity, rng=random):
+    """Returns a random ProbabilisticRule whose tree has the given complexity."""
+    rule = rules.random_rule(complexity, top_level=True, rng=rng)
+    leaf_probabilities = [(round(rng.uniform(*LEAF_PROBABILITY_IF_ACCEPTED), 2),
+        round(rng.uniform(*LEAF_PROBABILITY_IF_REJECTED), 2)) for leaf in leaves(rule)]
+    return ProbabilisticRule(rule, leaf_probabilities)
+
+
+if __name__ == "__main__":
+    raise Exception("Not intended to be called standalone.")
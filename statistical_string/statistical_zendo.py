@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+
+# Zendo-like game with probabilistic rules. Uses statistical_rules.py to construct a random
+# rule which accepts each string with some probability; the user tests strings (or runs many
+# trials of one) to learn the rule, then gives their credence that each of several strings
+# will be accepted, and is scored on that.
+
+from random import Random
+from argparse import ArgumentParser
+from getpass import getuser
+from math import log
+from os import path
+import re
+import sys
+import time
+
+import numpy as np
+
+import statistical_rules as r
+sys.path.append(path.join(path.dirname(path.realpath(__file__)), "..", "shared"))
+import gamelog
+import scoring
+
+# Configuration
+########################################################################
+
+NUM_TESTS = lambda d: 4 + d
+    # Number of words to test when the user claims GOTIT. This is a function of difficulty.
+
+NUM_STARTING_TRIALS = 10
+    # Number of trials to show of each starting example.
+
+MAX_TRIALS = 10 ** 7 # most trials the user can ask for at once
+
+GAMELOG_PATH = path.join(path.dirname(path.realpath(__file__)), "..", "games.log")
+    # Where finished games are logged, so users can track their statistics.
+
+
+# Global variables
+########################################################################
+
+known_words = {} # maps each tested word to [number of times accepted, number of trials]
+num_asks = 0 # Number of tests and batches of trials the user has asked for.
+queries = [] # (word, accepted) pairs of the single tests the user asked for, in order
+previous_test = None # last string the user tested
+
+parser = ArgumentParser(description="Statistical String Zendo.")
+parser.add_argument("--seed", type=int, help="seed for the random number generators, "
+        "to replay the same rule and trials")
+args = parser.parse_args()
+rng = Random(args.seed) # source of randomness for generating the rule and picking words
+np_rng = np.random.default_rng(args.seed) # source of randomness for trials
+
+
+# The actual game
+########################################################################
+
+difficulty = int(input("Enter rule complexity (2 is easy, 4 is moderate, 7 is difficult): "))
+print("Generating rule...")
+rule = r.random_rule(difficulty, rng)
+print("Generated rule.\n")
+
+def record_trials(word, num_accepted, num_trials):
+    counts = known_words.setdefault(word, [0, 0])
+    counts[0] += num_accepted
+    counts[1] += num_trials
+
+print("Each test of a string is a random trial; the same string may be accepted one time and")
+print("rejected the next. Type TRIALS followed by a number to run that many trials of the last")
+print("string you tested.\n")
+for word in (rng.choice(rule.rule.examples_accepted), rng.choice(rule.rule.examples_rejected)):
+    num_accepted = rule.trials(word, NUM_STARTING_TRIALS, np_rng)
+    record_trials(word, num_accepted, NUM_STARTING_TRIALS)
+    print("Example: %r was accepted in %s of %s trials." % (word, num_accepted, NUM_STARTING_TRIALS))
+
+def test_user_GOTIT():
+    """Test the user after they claim GOTIT.
+    Returns the user's log score and the expected log score of someone who knew the
+    rule's probabilities."""
+
+    num_tests = NUM_TESTS(difficulty)
+    print("\nYou will be asked to judge %s strings. Each will be tested once; for each one, enter" % num_tests)
+    print("your belief that the string will be accepted, from 0 to 1 (e.g. .5).")
+
+    all_probabilities = rule.probabilities()
+    indices_to_test = []
+    while len(indices_to_test) < num_tests:
+        i = rng.randrange(len(all_probabilities))
+        if r.rules.ALL_WORDS[i] not in known_words and i not in indices_to_test:
+            indices_to_test.append(i)
+    words_to_test = r.rules.ALL_WORDS.words_at(indices_to_test)
+    probabilities = all_probabilities[indices_to_test]
+    actually_accepted = np_rng.random(num_tests) < probabilities
+
+    probabilities_of_correct = []
+    for word, accepted in zip(words_to_test, actually_accepted):
+        print()
+        guess = scoring.read_credence(word)
+        probabilities_of_correct.append(guess if accepted else 1. - guess)
+
+    print("\nThe tests came out as follows respectively:")
+    print("\t", ", ".join(map((lambda x: "ACCEPTED" if x else "REJECTED"), actually_accepted)))
+    print("The true probabilities of acceptance were:")
+    print("\t", ", ".join("%.3f" % p for p in probabilities))
+    print("Over the whole dictionary, the rule accepts words with probability %.3f on average." %
+            all_probabilities.mean())
+
+    return (scoring.log_score(probabilities_of_correct),
+            scoring.expected_log_score(probabilities))
+
+def log_game(outcome, log_score=None):
+    """Saves the finished game to the game log, and shows the user's record at this
+    difficulty."""
+    record = gamelog.GameRecord("statistical", getuser(), time.time(), difficulty, str(rule),
+            queries, time.time() - start_time, outcome, log_score)
+    with gamelog.GameLog(GAMELOG_PATH) as log:
+        log.append(record)
+        stats = log.stats(game="statistical", player=record.player, difficulty=difficulty)
+    if stats.num_log_scores:
+        print("\nAt difficulty %s you have played %s games, with mean log score %s." %
+                (difficulty, stats.count, round(stats.mean_log_score, 5)))
+    else: # every game so far was given up
+        print("\nAt difficulty %s you have played %s games, with no scored games yet." %
+                (difficulty, stats.count))
+
+
+# Main game loop
+start_time = time.time()
+while True:
+    command = input("\nEnter lowercase string to test, or TRIALS n to run n trials of the last string, "
+            "or GIVEUP to give up, or GOTIT if you think you know the rule.\n> ").strip()
+    if command == "GIVEUP":
+        print("\nThe rule was:")
+        print(str(rule))
+        log_game("gave up")
+        break
+    elif command == "GOTIT":
+        log_score, oracle_log_score = test_user_GOTIT()
+
+        print("\nThe rule was:")
+        print(str(rule))
+
+        print("\nYour log score was %s (more is better); guessing .5 each time would have given %s," %
+                (round(log_score, 5), round(log(.5) * NUM_TESTS(difficulty), 2)))
+        print("and someone who knew the rule's exact probabilities would expect %s." %
+                round(oracle_log_score, 2))
+        print("Difficulty was %s and you asked for %s tests or batches of trials." % (difficulty, num_asks))
+
+        print("\nKnown results at the time you typed GOTIT were:")
+        for word, (num_accepted, num_trials) in known_words.items():
+            print("\t" + word.ljust(30) + " : accepted %s of %s times" % (num_accepted, num_trials))
+        log_game("scored", log_score)
+        break
+    elif command.startswith("TRIALS"):
+        try:
+            num_trials = int(command[len("TRIALS"):])
+            if not 1 <= num_trials <= MAX_TRIALS:
+                raise ValueError()
+        except ValueError:
+            print("Invalid. Enter TRIALS followed by a number of trials from 1 to %s." % MAX_TRIALS)
+            continue
+        if previous_test is None:
+            print("Test a string first.")
+            continue
+        num_accepted = rule.trials(previous_test, num_trials, np_rng)
+        record_trials(previous_test, num_accepted, num_trials)
+        print("String %r was accepted in %s of %s trials." % (previous_test, num_accepted, num_trials))
+        num_asks += 1
+    else: # command is a string to test
+        if re.match("^[a-z]*$", command) is None: # allows empty string
+            print("Invalid. Enter lowercase string consisting of only a-z, or TRIALS n, or GIVEUP, or GOTIT.")
+        else:
+            accepted = bool(rule.trials(command, 1, np_rng))
+            record_trials(command, int(accepted), 1)
+            queries.append((command, accepted))
+            previous_test = command
+            print("String %r is:  %s" % (command, ("ACCEPTED" if accepted else "REJECTED")))
+            num_asks += 1
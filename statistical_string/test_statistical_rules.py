@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+
+import unittest
+
+import numpy as np
+
+import statistical_rules as s
+import rules
+
+class TestProbabilisticRule(unittest.TestCase):
+    def setUp(self):
+        self.rule = s.ProbabilisticRule(
+                rules.DisjunctionRule(rules.ContainmentRule("x"),
+                    rules.NegationRule(rules.LengthMinimumRule(5))),
+                [(.9, .2), (.8, .1)])
+    def test_probability(self):
+        self.assertAlmostEqual(self.rule.probability("xylophone"), 1 - (1 - .9) * (1 - (1 - .8)))
+        self.assertAlmostEqual(self.rule.probability("cat"), 1 - (1 - .2) * (1 - (1 - .1)))
+    def test_dictionary_probabilities(self):
+        probabilities = self.rule.probabilities()
+        self.assertEqual(len(probabilities), len(rules.ALL_WORDS))
+        for i in range(0, len(rules.ALL_WORDS), 211):
+            self.assertAlmostEqual(probabilities[i], self.rule.probability(rules.ALL_WORDS[i]))
+    def test_trials(self):
+        num_accepted = self.rule.trials("xylophone", 100000, np.random.default_rng(0))
+        self.assertAlmostEqual(num_accepted / 100000, self.rule.probability("xylophone"), places=2)
+    def test_str(self):
+        self.assertEqual(str(self.rule), "(contains 'x' [0.9 if so, else 0.2]) or "
+                "(not (length at least 5 [0.8 if so, else 0.1]))")
+
+class TestMaskToArray(unittest.TestCase):
+    def test_mask_to_array(self):
+        array = s.mask_to_array(0b1011)
+        self.assertEqual(len(array), len(rules.ALL_WORDS))
+        self.assertEqual(list(np.flatnonzero(array)), [0, 1, 3])
+
+
+if __name__ == "__main__":
+	unittest.main()